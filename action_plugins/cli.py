@@ -36,6 +36,17 @@ options:
         generate Ansible facts.  If this argument is specified, the output
         from the command will be parsed based on the rules in the
         specified parser.
+      - If this argument is not specified and C(engine) is
+        C(command_parser), the parser is selected from the
+        C(parser_templates) directories in the search path by matching
+        C(command) against the C(command) of the C(parser_metadata)
+        directive of each parser.  Abbreviated commands such as
+        C(sh ip int br) are matched as well.  The output is not parsed
+        when no parser matches.
+      - If this argument is not specified and C(engine) is
+        C(textfsm_parser), the template is selected by C(command) from the
+        C(index) file of the C(parser_templates) directories in the search
+        path, see the C(command) argument of C(textfsm_parser).
     default: null
   engine:
     description:
@@ -46,6 +57,13 @@ options:
     choices:
       - command_parser
       - textfsm_parser
+  name:
+    description:
+      - The name of the fact C(textfsm_parser) exports the parsed rows as.
+        When the template is selected from the index, defaults to the
+        name of the template file.
+    default: null
+    version_added: "2.6"
 """
 
 EXAMPLES = """
@@ -57,6 +75,16 @@ EXAMPLES = """
   cli:
     command: show version
     parser: parser_templates/show_version.yaml
+
+- name: parse output with the parser whose parser_metadata matches the command
+  cli:
+    command: sh ver
+
+- name: parse output with the TextFSM template the index selects for the command
+  cli:
+    command: show interfaces
+    engine: textfsm_parser
+    name: interfaces
 """
 
 RETURN = """
@@ -68,15 +96,27 @@ json:
   description: the output converted from json to a hash
   returned: always
   type: dict
+format:
+  description:
+    - The format of the output, C(json), C(xml) or C(text).  XML output,
+      such as C(| display xml) on Junos, is not converted and is passed to
+      the parser as text for the C(xml_select) directive.
+  returned: always
+  type: str
 """
 
 import json
+import os
+import sys
 
 from ansible.plugins.action import ActionBase
 from ansible.module_utils.connection import Connection, ConnectionError
 from ansible.module_utils._text import to_text
 from ansible.errors import AnsibleError
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.path.pardir, 'lib'))
+from network_engine.plugins.parser.xml_select import is_xml
+
 try:
     from __main__ import display
 except ImportError:
@@ -99,6 +139,7 @@ class ActionModule(ActionBase):
             command = self._task.args['command']
             parser = self._task.args.get('parser')
             engine = self._task.args.get('engine', 'command_parser')
+            name = self._task.args.get('name')
         except KeyError as exc:
             raise AnsibleError(to_text(exc))
 
@@ -116,14 +157,37 @@ class ActionModule(ActionBase):
 
         result['stdout'] = output
 
-        # try to convert the cli output to native json
-        try:
-            json_data = json.loads(output)
-        except:
-            json_data = None
+        # XML output is passed to the parser as text for the xml_select
+        # directive to stream, otherwise try to convert the cli output to
+        # native json
+        json_data = None
+        if is_xml(output):
+            result['format'] = 'xml'
+        else:
+            try:
+                json_data = json.loads(output)
+            except:
+                pass
+            result['format'] = 'text' if json_data is None else 'json'
 
         result['json'] = json_data
 
+        # select the parser by command from the parser_metadata of the
+        # templates in parser_templates when none is given
+        if not parser and engine == 'command_parser':
+            index_parser = self._get_parser_action(engine, {})
+            sources = index_parser.find_parser(command, index_parser.parser_paths(task_vars), task_vars.get('ansible_network_os'))
+            if sources:
+                parser = sources[0]
+
+        # select the template from the index of the parser_templates
+        # directories when none is given
+        if not parser and engine == 'textfsm_parser':
+            index_parser = self._get_parser_action(engine, {})
+            parser = index_parser.find_template(command, index_parser.template_paths(task_vars), task_vars)
+            if parser and not name:
+                name = os.path.basename(parser).split('.')[0]
+
         if parser:
             if engine not in ('command_parser', 'textfsm_parser', 'text_parser', 'textfsm'):
                 raise AnsibleError('missing or invalid value for argument engine')
@@ -137,22 +201,14 @@ class ActionModule(ActionBase):
                                    version='2.6',
                                    removed=False)
 
-            new_task = self._task.copy()
-            new_task.args = {
+            parser_args = {
                 'file': parser,
                 'content': (json_data or output)
             }
+            if engine == 'textfsm_parser' and name:
+                parser_args['name'] = name
 
-            kwargs = {
-                'task': new_task,
-                'connection': self._connection,
-                'play_context': self._play_context,
-                'loader': self._loader,
-                'templar': self._templar,
-                'shared_loader_obj': self._shared_loader_obj
-            }
-
-            task_parser = self._shared_loader_obj.action_loader.get(engine, **kwargs)
+            task_parser = self._get_parser_action(engine, parser_args)
             result.update(task_parser.run(task_vars=task_vars))
 
         self._remove_tmp_path(self._connection._shell.tmpdir)
@@ -164,3 +220,18 @@ class ActionModule(ActionBase):
         self._task.args['_ansible_socket'] = socket_path
 
         return result
+
+    def _get_parser_action(self, engine, args):
+        new_task = self._task.copy()
+        new_task.args = args
+
+        kwargs = {
+            'task': new_task,
+            'connection': self._connection,
+            'play_context': self._play_context,
+            'loader': self._loader,
+            'templar': self._templar,
+            'shared_loader_obj': self._shared_loader_obj
+        }
+
+        return self._shared_loader_obj.action_loader.get(engine, **kwargs)
@@ -13,21 +13,21 @@ import collections
 
 from ansible import constants as C
 from ansible.plugins.action import ActionBase
-from ansible.module_utils.six import iteritems, iterkeys, string_types
+from ansible.module_utils.six import iteritems, string_types
 from ansible.module_utils._text import to_text
+from ansible.module_utils.parsing.convert_bool import boolean
 from ansible.errors import AnsibleError
 
-from ansible.plugins.filter.core import combine
-
-try:
-    from ansible.module_utils.network.common.utils import to_list
-except ImportError:
-    # keep role compatible with Ansible 2.4
-    from ansible.module_utils.network_common import to_list
-
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.path.pardir, 'lib'))
-from network_engine.plugins import template_loader, parser_loader
-from network_engine.utils import dict_merge
+from network_engine.plugins import template_loader, parser_loader, get_engine
+from network_engine.utils import dict_merge, to_list
+from network_engine import compiler
+from network_engine.index import get_index, ParserIndexError
+from network_engine import regex_backend
+from network_engine.content import open_content, resolve_views
+from network_engine.facts import delta_facts, intern_facts
+from network_engine.sections import section_regex, split_sections
+from network_engine.watchdog import TIMEOUT_POLICIES, RegexTimeout, Watchdog, backtracking_risks, parser_regexes
 
 
 try:
@@ -44,11 +44,15 @@ def warning(msg):
 
 class ActionModule(ActionBase):
 
-    VALID_FILE_EXTENSIONS = ('.yaml', '.yml', '.json')
-    VALID_GROUP_DIRECTIVES = ('pattern_group', 'block')
-    VALID_ACTION_DIRECTIVES = ('parser_metadata', 'pattern_match', 'set_vars', 'json_template')
-    VALID_DIRECTIVES = VALID_GROUP_DIRECTIVES + VALID_ACTION_DIRECTIVES
-    VALID_EXPORT_AS = ('list', 'elements', 'dict', 'object', 'hash')
+    VALID_FILE_EXTENSIONS = compiler.VALID_FILE_EXTENSIONS
+    VALID_GROUP_DIRECTIVES = compiler.VALID_GROUP_DIRECTIVES
+    VALID_ACTION_DIRECTIVES = compiler.VALID_ACTION_DIRECTIVES
+    VALID_DIRECTIVES = compiler.VALID_DIRECTIVES
+    VALID_EXPORT_AS = compiler.VALID_EXPORT_AS
+
+    watchdog = None
+    timeout_policy = 'fail'
+    stopped = False
 
     def run(self, tmp=None, task_vars=None):
         if task_vars is None:
@@ -56,17 +60,41 @@ class ActionModule(ActionBase):
 
         result = super(ActionModule, self).run(tmp, task_vars)
 
-        try:
-            source_dir = self._task.args.get('dir')
-            source_file = self._task.args.get('file')
-            content = self._task.args['content']
-        except KeyError as exc:
-            return {'failed': True, 'msg': 'missing required argument: %s' % exc}
+        source_dir = self._task.args.get('dir')
+        source_file = self._task.args.get('file')
+        content = self._task.args.get('content')
+        content_file = self._task.args.get('content_file')
+
+        if content is None and content_file is None:
+            return {'failed': True, 'msg': 'missing required argument: content'}
+
+        if content is not None and content_file is not None:
+            return {'failed': True, 'msg': '`content` and `content_file` are mutually exclusive arguments'}
+
+        command = self._task.args.get('command')
+        sections = self._task.args.get('sections')
 
         if source_dir and source_file:
             return {'failed': True, 'msg': '`dir` and `file` are mutually exclusive arguments'}
 
-        if source_dir:
+        if source_file and command:
+            return {'failed': True, 'msg': '`file` and `command` are mutually exclusive arguments'}
+
+        if sections and (source_file or command):
+            return {'failed': True, 'msg': '`sections` is mutually exclusive with `file` and `command`'}
+
+        if sections:
+            # the parsers are selected per section once the content is split
+            paths = to_list(source_dir) if source_dir else self.parser_paths(task_vars)
+            sources = list()
+
+        elif command:
+            paths = to_list(source_dir) if source_dir else self.parser_paths(task_vars)
+            sources = self.find_parser(command, paths, task_vars.get('ansible_network_os'))
+            if not sources:
+                raise AnsibleError('no parser found for command `%s` in %s' % (command, ', '.join(paths) or 'the search path'))
+
+        elif source_dir:
             sources = self.get_files(to_list(source_dir))
         else:
             if source_file:
@@ -93,22 +121,71 @@ class ActionModule(ActionBase):
                 else:
                     sources = self.get_parser(path=searchpath[0])
 
-        facts = {}
+        if content_file is not None:
+            content_path = os.path.expanduser(content_file)
+            if not os.path.isfile(content_path):
+                raise AnsibleError("content_file [%s] is either missing or invalid" % content_path)
+            content = open_content(content_path)
+
+        if sections:
+            self.set_regex_backend(task_vars.get('network_engine_regex_backend'))
+            dispatched = self.dispatch_sections(content, sections, paths, task_vars.get('ansible_network_os'))
+            jobs = [(src, section) for cmd, src, section in dispatched if src]
+            for src, section in jobs:
+                if src not in sources:
+                    sources.append(src)
+            result['sections'] = [{'command': cmd, 'parser': src} for cmd, src, section in dispatched]
+        else:
+            jobs = [(src, content) for src in sources]
 
-        self.template = template_loader.get('json_template', self._templar)
+        facts = {}
 
-        for src in sources:
+        self.template = get_engine(template_loader, 'json_template')(self._templar)
+        self.set_watchdog(task_vars)
+        self.regex_timeouts = list()
+
+        prune = boolean(task_vars.get('network_engine_prune_directives', False), strict=False)
+        if boolean(task_vars.get('network_engine_directive_report', False), strict=False):
+            result['directive_graph'] = {}
+
+        cache = self.get_parse_cache(task_vars)
+        cached = None
+        loaded = {}
+        if cache is not None:
+            key = self.parse_cache_key(jobs, content, task_vars, loaded)
+            result['parse_cache'], cached = cache.get(key)
+            if cached is not None:
+                facts = cached
+                jobs = []
+
+        for src, src_content in jobs:
             src_path = os.path.expanduser(src)
             if not os.path.exists(src_path) and not os.path.isfile(src_path):
                 raise AnsibleError("src [%s] is either missing or invalid" % src_path)
 
-            tasks = self._loader.load_from_file(src)
+            tasks = loaded.pop(src, None)
+            if tasks is None:
+                tasks = self.load_parser(src)
+            if prune or 'directive_graph' in result:
+                tasks = self.prune_directives(src_path, tasks, prune, result.get('directive_graph'))
+
+            self.set_regex_backend(task_vars.get('network_engine_regex_backend'))
 
-            self.ds = {'content': content}
+            self.ds = {'content': src_content}
             self.ds.update(task_vars)
 
+            self.parser = src
+            self.stopped = False
+            if self.watchdog is not None:
+                self.watchdog.start()
+
             for task in tasks:
+                if self.stopped:
+                    display.vvv('command_parser: returning partial facts of %s' % src)
+                    break
+
                 name = task.pop('name', None)
+                self.directive = name
                 display.vvvv('processing directive: %s' % name)
 
                 register = task.pop('register', None)
@@ -214,6 +291,31 @@ class ActionModule(ActionBase):
 
                 task_vars.update(facts)
 
+        if content_file is not None:
+            facts = resolve_views(facts)
+
+        if cache is not None and cached is None and not self.regex_timeouts:
+            cache.set(key, facts)
+
+        store = self._templar.template(task_vars.get('network_engine_fact_store'))
+        if store and facts:
+            parser = ','.join(os.path.basename(src) for src in sources)
+            result['fact_store_record'] = self.store_facts(store, task_vars, parser, facts)
+            if boolean(task_vars.get('network_engine_fact_store_only', False), strict=False):
+                facts = {}
+
+        if boolean(self._task.args.get('delta', False), strict=False):
+            facts, result['delta'] = delta_facts(task_vars.get('ansible_facts') or {}, facts)
+
+        if boolean(task_vars.get('network_engine_intern_facts', False), strict=False):
+            facts = intern_facts(facts)
+
+        if self.regex_timeouts:
+            result['regex_timeouts'] = self.regex_timeouts
+
+        if self.watchdog is not None and boolean(task_vars.get('network_engine_regex_stats', False), strict=False):
+            result['regex_stats'] = self.watchdog.report()
+
         result.update({
             'ansible_facts': facts,
             'included': sources
@@ -262,15 +364,249 @@ class ActionModule(ActionBase):
 
         return update_set
 
+    def load_parser(self, path):
+        """Load the directives of a parser file
+
+        If a compiled artifact that is up to date with the parser source
+        exists, the directives are loaded from the artifact and the YAML
+        source is not parsed.
+
+        :param path: path to the parser source or compiled artifact
+
+        :returns: list of directives
+        """
+        artifact = compiler.artifact_path(path)
+
+        if os.path.exists(artifact):
+            tasks = compiler.load_artifact(artifact)
+            if tasks is not None:
+                display.vvvv('command_parser: using compiled parser %s' % artifact)
+                self.check_regexes(path, tasks)
+                return tasks
+
+        if path == artifact:
+            raise AnsibleError('compiled parser %s is invalid or out of date, please recompile it' % path)
+
+        tasks = self._loader.load_from_file(path)
+        self.check_regexes(path, tasks)
+        return tasks
+
+    def prune_directives(self, path, tasks, prune=True, report=None):
+        """Remove the directives whose results cannot reach an exported fact
+
+        The dependency graph of the directives is built once per parser
+        file, see network_engine.graph.  The pruned directives are still
+        checked to be valid directives.
+
+        :param path: path to the parser file
+        :param tasks: the directives loaded from the parser
+        :param prune: when False the graph is only reported
+        :param report: dict the report of the graph is added to by path
+
+        :returns: list of the live directives
+        """
+        from network_engine.cache import file_hash
+        from network_engine.graph import parser_graph
+
+        graph = parser_graph(file_hash(path), tasks)
+        if report is not None:
+            report[path] = graph.report()
+
+        if not prune:
+            return tasks
+
+        for entry in graph.pruned():
+            if entry['directive'] not in self.VALID_DIRECTIVES and entry['directive'] != 'block':
+                raise AnsibleError('invalid directive in parser: %s' % entry['directive'])
+            display.vvv('command_parser: pruned directive [%s] of %s, it %s' % (entry['name'], path, entry['reason']))
+        return [tasks[index] for index in graph.live_indexes()]
+
+    def check_regexes(self, path, tasks):
+        """Warn about the regexes of a parser prone to catastrophic backtracking
+        """
+        for name, regex in parser_regexes(tasks):
+            for reason in backtracking_risks(regex):
+                warning('parser %s directive [%s]: regex %r %s and can backtrack catastrophically' % (path, name, regex, reason))
+
+    def get_parse_cache(self, task_vars):
+        """Return the parse cache selected by the task variables or None
+        """
+        from network_engine.cache import open_cache
+
+        try:
+            return open_cache(self._templar.template(task_vars.get('network_engine_parse_cache')),
+                              self._templar.template(task_vars.get('network_engine_parse_cache_size')))
+        except (OSError, ValueError) as exc:
+            raise AnsibleError('unable to open the parse cache: %s' % to_text(exc))
+
+    def parse_cache_key(self, jobs, content, task_vars, loaded):
+        """Return the parse cache key of the content and parsers of a task
+
+        The key is a hash of the parser files, the content and the values
+        of the variables the parsers reference.
+
+        :param loaded: dict the directives of the parsers are added to by
+            source, so they are not loaded again to run them
+        """
+        from network_engine.cache import cache_key, parser_variables
+
+        parsers = list()
+        names = set(['ansible_network_os', 'network_engine_regex_backend', 'network_engine_prune_directives'])
+        for src, src_content in jobs:
+            src_path = os.path.expanduser(src)
+            if not os.path.isfile(src_path):
+                raise AnsibleError("src [%s] is either missing or invalid" % src_path)
+            if src not in loaded:
+                loaded[src] = self.load_parser(src)
+            digest, referenced = parser_variables(src_path, loaded[src])
+            parsers.append(digest)
+            names.update(referenced)
+
+        values = {}
+        for name in sorted(names):
+            value = task_vars.get(name)
+            try:
+                value = self._templar.template(value)
+            except Exception:
+                pass
+            values[name] = value
+
+        return cache_key('command_parser', parsers, self._task.args.get('sections'), values, content)
+
+    def set_watchdog(self, task_vars):
+        """Set the watchdog of the regex scans from the task variables
+
+        The watchdog is only used when a time budget is set or the regex
+        statistics are requested.
+        """
+        budgets = list()
+        for var in ('network_engine_regex_timeout', 'network_engine_parse_timeout'):
+            value = task_vars.get(var)
+            if value is not None:
+                try:
+                    value = float(value)
+                except (TypeError, ValueError):
+                    raise AnsibleError('%s must be a number of seconds, got %s' % (var, value))
+            budgets.append(value)
+
+        policy = task_vars.get('network_engine_regex_timeout_policy') or 'fail'
+        if policy not in TIMEOUT_POLICIES:
+            raise AnsibleError('invalid network_engine_regex_timeout_policy %s, expected one of %s' % (policy, ', '.join(TIMEOUT_POLICIES)))
+        self.timeout_policy = policy
+
+        if budgets != [None, None] or boolean(task_vars.get('network_engine_regex_stats', False), strict=False):
+            self.watchdog = Watchdog(*budgets)
+        else:
+            self.watchdog = None
+
+    def regex_timeout(self, exc):
+        """Apply the timeout policy to a scan that exceeded its budget
+        """
+        msg = 'regex %r of directive [%s] in parser %s exceeded its time budget of %ss' % (exc.regex, self.directive, self.parser, exc.budget)
+        if self.timeout_policy == 'fail':
+            raise AnsibleError(msg)
+
+        self.regex_timeouts.append({'parser': self.parser, 'directive': self.directive, 'regex': exc.regex,
+                                    'elapsed': round(exc.elapsed, 3)})
+        if self.timeout_policy == 'skip':
+            warning('%s, skipping the directive' % msg)
+        else:
+            warning('%s, returning partial facts' % msg)
+            self.stopped = True
+
+    def find_parser(self, command, paths, network_os=None):
+        """Find the parser for a command using the parser index
+
+        The parser is selected by the `command` of its `parser_metadata`
+        directive.  The index of each path is cached and only rebuilt when
+        the templates in it change.
+
+        :param command: the command that produced the content
+        :param paths: list of directories to search, in order
+        :param network_os: the network_os of the device
+
+        :returns: list with the path of the selected parser or an empty
+            list if no parser matches the command
+        """
+        for path in paths:
+            if not os.path.isdir(path):
+                raise AnsibleError('%s does not appear to be a valid directory' % path)
+
+            try:
+                src = get_index(path, self.load_parser).match(command, network_os)
+            except ParserIndexError as exc:
+                raise AnsibleError(to_text(exc))
+
+            if src:
+                display.vvv('command_parser: using parser %s for command `%s`' % (src, command))
+                return [src]
+
+        return list()
+
+    def store_facts(self, path, task_vars, parser, facts):
+        """Write the facts of the host to the fact store at path
+
+        :returns: the id of the record
+        """
+        from network_engine.store import write_facts, FactStoreError
+
+        try:
+            return write_facts(os.path.expanduser(path), task_vars.get('inventory_hostname'), parser, facts,
+                               self._templar.template(task_vars.get('network_engine_fact_store_keep')))
+        except FactStoreError as exc:
+            raise AnsibleError(to_text(exc))
+
+    def dispatch_sections(self, content, profile, paths, network_os=None):
+        """Split a tech-support capture into sections and find their parsers
+
+        The content is split at the delimiter lines of the section profile
+        and the parser of every section is found in the parser index by the
+        command of the section, as for the `command` argument.
+
+        :param content: the capture, a string or a ContentView
+        :param profile: True for the profile of network_os, a profile name
+            or a delimiter regex with a `command` named group
+        :param paths: list of directories to search for parsers, in order
+        :param network_os: the network_os of the device
+
+        :returns: list of (command, parser path or None, section) tuples
+        """
+        try:
+            regex = section_regex(profile, network_os)
+            found = split_sections(content, regex, self.regex_backend)
+        except ValueError as exc:
+            raise AnsibleError(to_text(exc))
+
+        if not found:
+            warning('no command sections found in content')
+
+        parsers = {}
+        dispatched = list()
+        for command, section in found:
+            if command not in parsers:
+                src = self.find_parser(command, paths, network_os)
+                parsers[command] = src[0] if src else None
+                if not src:
+                    display.vvv('command_parser: no parser for section `%s`' % command)
+            dispatched.append((command, parsers[command], section))
+
+        return dispatched
+
+    def parser_paths(self, task_vars):
+        """Return the parser_templates directories in the search path
+        """
+        searchpath = task_vars.get('ansible_search_path') or [self._loader._basedir]
+        paths = [os.path.join(p, 'parser_templates') for p in searchpath]
+        return [p for p in paths if os.path.isdir(p)]
+
     def get_parser(self, path):
         sources = list()
         src_file = list()
 
-        for i in os.listdir(path):
+        filenames = self._parser_files(path)
+        for i in filenames:
             if i.startswith('show_'):
-                f, ext = os.path.splitext(i)
-                if ext in self.VALID_FILE_EXTENSIONS:
-                    src_file.append(i)
+                src_file.append(i)
 
         if len(src_file) == 1:
             sources.append(os.path.join(path, src_file[0]))
@@ -283,26 +619,41 @@ class ActionModule(ActionBase):
 
     def get_files(self, source_dirs):
         include_files = list()
-        _processed = set()
 
         for source_dir in source_dirs:
             if not os.path.isdir(source_dir):
                 raise AnsibleError('%s does not appear to be a valid directory' % source_dir)
 
-            for filename in os.listdir(source_dir):
-                fn, fext = os.path.splitext(filename)
-                if fn not in _processed:
-                    _processed.add(fn)
+            for filename in self._parser_files(source_dir):
+                filename = os.path.join(source_dir, filename)
 
-                    filename = os.path.join(source_dir, filename)
-
-                    if not os.path.isfile(filename) or fext not in self.VALID_FILE_EXTENSIONS:
-                        continue
-                    else:
-                        include_files.append(filename)
+                if os.path.isfile(filename):
+                    include_files.append(filename)
 
         return include_files
 
+    def _parser_files(self, path):
+        """Return one parser filename per parser name found in path
+
+        A compiled artifact is only returned when its source file is not
+        present, otherwise the source is returned and load_parser() will
+        pick up the artifact.
+        """
+        filenames = list()
+        _processed = set()
+
+        listing = os.listdir(path)
+        listing.sort(key=lambda x: x.endswith(compiler.ARTIFACT_SUFFIX))
+
+        for filename in listing:
+            fn = compiler.source_stem(filename)
+            fext = os.path.splitext(filename)[1]
+            if fn not in _processed and fext in self.VALID_FILE_EXTENSIONS:
+                _processed.add(fn)
+                filenames.append(filename)
+
+        return filenames
+
     def rec_update(self, d, u):
         for k, v in iteritems(u):
             if isinstance(v, collections.Mapping):
@@ -320,6 +671,7 @@ class ActionModule(ActionBase):
             task = entry.copy()
 
             name = task.pop('name', None)
+            self.directive = name
             display.vvv("command_parser: starting pattern_match [%s] in pattern_group" % name)
 
             register = task.pop('register', None)
@@ -337,7 +689,7 @@ class ActionModule(ActionBase):
             loop_var = task.pop('loop_control', {}).get('loop_var') or 'item'
             display.vvvv('command_parser: loop_var is %s' % loop_var)
 
-            if not set(task).issubset(('pattern_group', 'pattern_match')):
+            if not set(task).issubset(compiler.PATTERN_GROUP_DIRECTIVES):
                 raise AnsibleError('invalid directive specified')
 
             if 'pattern_group' in task:
@@ -394,18 +746,67 @@ class ActionModule(ActionBase):
             else:
                 raise AnsibleError('invalid directive: %s' % directive)
 
-    def do_parser_metadata(self, version=None, command=None, network_os=None):
+    def set_regex_backend(self, name):
+        try:
+            backend = regex_backend.get_backend(name)
+        except ValueError as exc:
+            raise AnsibleError(to_text(exc))
+
+        if backend is None:
+            warning('regex backend %s is not installed, using re' % name)
+
+        self.regex_backend = name
+
+    def do_parser_metadata(self, version=None, command=None, network_os=None, regex_backend=None):
         if version:
             display.vvv('command_parser: using parser version %s' % version)
 
+        if regex_backend:
+            self.set_regex_backend(regex_backend)
+
         if network_os not in (None, self.ds['ansible_network_os']):
             raise AnsibleError('parser expected %s, got %s' % (network_os, self.ds['ansible_network_os']))
 
-    def do_pattern_match(self, regex, content=None, match_all=None, match_until=None, match_greedy=None):
+    def do_pattern_match(self, regex, content=None, match_all=None, match_until=None, match_greedy=None, types=None):
+        if self.stopped:
+            return None
         content = self.template(content, self.ds) or self.template("{{ content }}", self.ds)
         regex = self.template(regex, self.ds)
-        parser = parser_loader.get('pattern_match', content)
-        return parser.match(regex, match_all, match_until, match_greedy)
+        parser = get_engine(parser_loader, 'pattern_match')(content, self.regex_backend, self.watchdog)
+        try:
+            return parser.match(regex, match_all, match_until, match_greedy, types)
+        except RegexTimeout as exc:
+            self.regex_timeout(exc)
+
+    def do_table_match(self, content=None, header=None, columns=None, match_until=None, wrapped=None, types=None):
+        content = self.template(content, self.ds) or self.template("{{ content }}", self.ds)
+        header = self.template(header, self.ds)
+        columns = self.template(columns, self.ds)
+        parser = get_engine(parser_loader, 'table_match')(content, self.regex_backend)
+        return parser.match(header, columns, match_until, wrapped, types)
+
+    def do_json_select(self, path, content=None):
+        # the content of the task is used as it is, only a content given to
+        # the directive is templated
+        if content is None:
+            content = self.ds['content']
+        else:
+            content = self.template(content, self.ds)
+        path = self.template(path, self.ds)
+        parser = get_engine(parser_loader, 'json_select')(content)
+        return parser.match(path)
+
+    def do_xml_select(self, path, fields=None, content=None, types=None):
+        # the XML is streamed from the content of the task, which is not
+        # templated
+        if content is None:
+            content = self.ds['content']
+        else:
+            content = self.template(content, self.ds)
+        path = self.template(path, self.ds)
+        fields = self.template(fields, self.ds)
+        parser = get_engine(parser_loader, 'xml_select')(content)
+        return parser.match(path, fields, types)
 
     def do_json_template(self, template):
         return self.template.run(template, self.ds)
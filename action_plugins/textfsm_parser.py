@@ -9,11 +9,21 @@
 from __future__ import (absolute_import, division, print_function)
 __metaclass__ = type
 
+import os
+import sys
+
 from ansible.module_utils.six import StringIO, string_types
+from ansible.module_utils.parsing.convert_bool import boolean
+from ansible.module_utils._text import to_text
 
 from ansible.plugins.action import ActionBase
 from ansible.errors import AnsibleError
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.path.pardir, 'lib'))
+from network_engine.facts import intern_facts
+from network_engine.textfsm_index import get_template_index, TemplateIndexError
+from network_engine.utils import to_list
+
 try:
     import textfsm
     HAS_TEXTFSM = True
@@ -41,41 +51,171 @@ class ActionModule(ActionBase):
                 src = self._task.args.get('src')
                 content = self._task.args['content']
                 name = self._task.args.get('name')
+                command = self._task.args.get('command')
+                template_dir = self._task.args.get('dir')
+                output = self._task.args.get('output', 'list')
             except KeyError as exc:
                 raise AnsibleError('missing required argument: %s' % exc)
 
             if src and filename:
                 raise AnsibleError('`src` and `file` are mutually exclusive arguments')
 
-            if not isinstance(content, string_types):
-                return {'failed': True, 'msg': '`content` must be of type str, got %s' % type(content)}
+            if command and (src or filename):
+                raise AnsibleError('`command` is mutually exclusive with `file` and `src`')
 
-            if filename:
-                tmpl = open(filename)
-            else:
-                tmpl = StringIO()
-                tmpl.write(src.strip())
-                tmpl.seek(0)
+            if output not in ('list', 'dict'):
+                raise AnsibleError('invalid value for argument output, expected one of list, dict')
 
-            try:
-                re_table = textfsm.TextFSM(tmpl)
-                fsm_results = re_table.ParseText(content)
+            if command:
+                paths = to_list(template_dir) if template_dir else self.template_paths(task_vars)
+                filename = self.find_template(command, paths, task_vars)
+                if not filename:
+                    raise AnsibleError('no template found for command `%s` in %s' % (command, ', '.join(paths) or 'the search path'))
+                result['included'] = [filename]
 
-            except Exception as exc:
-                raise AnsibleError(str(exc))
+            if not isinstance(content, string_types):
+                return {'failed': True, 'msg': '`content` must be of type str, got %s' % type(content)}
 
-            final_facts = []
-            for item in fsm_results:
-                facts = {}
-                facts.update(dict(zip(re_table.header, item)))
-                final_facts.append(facts)
+            final_facts = None
+            cache = self.get_parse_cache(task_vars)
+            if cache is not None:
+                from network_engine.cache import cache_key, file_hash
+                key = cache_key('textfsm_parser', file_hash(filename) if filename else src.strip(), content, output)
+                result['parse_cache'], final_facts = cache.get(key)
+
+            if final_facts is None:
+                if filename:
+                    tmpl = open(filename)
+                else:
+                    tmpl = StringIO()
+                    tmpl.write(src.strip())
+                    tmpl.seek(0)
+
+                try:
+                    re_table = textfsm.TextFSM(tmpl)
+                    fsm_results = re_table.ParseText(content)
+
+                except Exception as exc:
+                    raise AnsibleError(str(exc))
+
+                if output == 'dict':
+                    final_facts = self.keyed_rows(re_table, fsm_results)
+                else:
+                    final_facts = []
+                    for item in fsm_results:
+                        facts = {}
+                        facts.update(dict(zip(re_table.header, item)))
+                        final_facts.append(facts)
+
+                if cache is not None:
+                    cache.set(key, final_facts)
+
+            if boolean(task_vars.get('network_engine_intern_facts', False), strict=False):
+                final_facts = intern_facts(final_facts)
 
             if name:
                 result['ansible_facts'] = {name: final_facts}
             else:
                 result['ansible_facts'] = {}
 
+            store = self._templar.template(task_vars.get('network_engine_fact_store'))
+            if store and name:
+                from network_engine.store import write_facts, FactStoreError
+                parser = os.path.basename(filename) if filename else 'src'
+                try:
+                    result['fact_store_record'] = write_facts(os.path.expanduser(store), task_vars.get('inventory_hostname'),
+                                                              parser, result['ansible_facts'],
+                                                              self._templar.template(task_vars.get('network_engine_fact_store_keep')))
+                except FactStoreError as exc:
+                    raise AnsibleError(str(exc))
+                if boolean(task_vars.get('network_engine_fact_store_only', False), strict=False):
+                    result['ansible_facts'] = {}
+
         finally:
             self._remove_tmp_path(self._connection._shell.tmpdir)
 
         return result
+
+    def get_parse_cache(self, task_vars):
+        """Return the parse cache selected by the task variables or None
+        """
+        from network_engine.cache import open_cache
+
+        try:
+            return open_cache(self._templar.template(task_vars.get('network_engine_parse_cache')),
+                              self._templar.template(task_vars.get('network_engine_parse_cache_size')))
+        except (OSError, ValueError) as exc:
+            raise AnsibleError('unable to open the parse cache: %s' % to_text(exc))
+
+    def keyed_rows(self, re_table, rows):
+        """Return the rows as a dict keyed by the Key values of the template
+
+        With several Key values the dicts are nested, in the order the
+        values are defined in the template, so the row of a composite key
+        is found with one lookup per Key value.
+
+        :param re_table: the TextFSM object the rows were parsed with
+        :param rows: the list of rows returned by ParseText
+
+        :returns: dict of the row dicts by key
+        """
+        keys = re_table.GetValuesByAttrib('Key')
+        if not keys:
+            raise AnsibleError('`output: dict` requires the template to define at least one Key value')
+
+        lists = set(keys).intersection(re_table.GetValuesByAttrib('List'))
+        if lists:
+            raise AnsibleError('Key values cannot be List values: %s' % ', '.join(sorted(lists)))
+
+        header = re_table.header
+        indexes = [header.index(k) for k in keys]
+
+        facts = {}
+        for item in rows:
+            node = facts
+            for index in indexes[:-1]:
+                node = node.setdefault(item[index], {})
+
+            value = item[indexes[-1]]
+            if value in node:
+                raise AnsibleError('duplicate key %s in the parsed rows'
+                                   % ', '.join('%s=%s' % (k, item[i]) for k, i in zip(keys, indexes)))
+            node[value] = dict(zip(header, item))
+
+        return facts
+
+    def template_paths(self, task_vars):
+        """Return the parser_templates directories in the search path
+        """
+        searchpath = task_vars.get('ansible_search_path') or [self._loader._basedir]
+        paths = [os.path.join(p, 'parser_templates') for p in searchpath]
+        return [p for p in paths if os.path.isdir(p)]
+
+    def find_template(self, command, paths, task_vars):
+        """Find the template for a command in the index of the template directories
+
+        The index of every directory is parsed once per process.
+
+        :param command: the command that produced the content
+        :param paths: list of directories to search, in order
+        :param task_vars: the task variables, for the platform and hostname
+
+        :returns: the path of the template or None if no template matches
+        """
+        platform = task_vars.get('network_engine_textfsm_platform') or task_vars.get('ansible_network_os')
+        hostname = task_vars.get('inventory_hostname')
+
+        for path in paths:
+            if not os.path.isdir(path):
+                raise AnsibleError('%s does not appear to be a valid directory' % path)
+
+            try:
+                index = get_template_index(path)
+                template = index.match(command, platform, hostname) if index else None
+            except TemplateIndexError as exc:
+                raise AnsibleError(str(exc))
+
+            if template:
+                return template
+
+        return None
@@ -7,7 +7,7 @@ __metaclass__ = type
 
 import re
 
-from ansible.module_utils.six import string_types
+from ansible.module_utils.six import iteritems, string_types
 from ansible.errors import AnsibleFilterError
 
 
@@ -54,6 +54,41 @@ def interface_range(interface):
     return ['%s%s' % (prefix, index) for index in indicies]
 
 
+def _natural_key(value):
+    return tuple([int(t) if t.isdigit() else t for t in re.split(r'(\d+)', value)])
+
+
+def interface_compress(interfaces):
+    if not isinstance(interfaces, list):
+        raise AnsibleFilterError('value must be of type list, got %s' % type(interfaces))
+
+    groups = dict()
+    singles = set()
+
+    for interface in interfaces:
+        if not isinstance(interface, string_types):
+            raise AnsibleFilterError('interface must be of type string, got %s' % type(interface))
+
+        # only fold names that interface_range is able to expand again
+        match = re.match(r'([A-Za-z]*|.*/)(\d+)$', interface)
+        if not match or match.group(2) != str(int(match.group(2))):
+            singles.add(interface)
+            continue
+
+        prefix, index = match.groups()
+        groups.setdefault(prefix, list()).append(int(index))
+
+    compressed = list()
+
+    for prefix, indices in iteritems(groups):
+        ranges = ','.join(['%d' % s if s == e else '%d-%d' % (s, e) for (s, e) in _gen_ranges(indices)])
+        compressed.append('%s%s' % (prefix, ranges))
+
+    compressed.extend(singles)
+
+    return sorted(compressed, key=_natural_key)
+
+
 def _gen_ranges(vlan):
     s = e = None
     for i in sorted(vlan):
@@ -101,6 +136,91 @@ def vlan_expand(vlan):
     return ['%d' % int(index) for index in indices]
 
 
+VLAN_MAX = 4095
+
+
+def _vlan_bitmap(vlan):
+    """ Convert a vlan range string or list of vlans into an integer bitmap
+
+    Bit N of the returned value is set when vlan N is a member of the set,
+    so ranges are added with a single mask instead of one entry per vlan.
+    """
+    if isinstance(vlan, bool):
+        raise AnsibleFilterError('value must be of type string, list or int, got %s' % type(vlan))
+    elif isinstance(vlan, int):
+        items = [vlan]
+    elif isinstance(vlan, string_types):
+        match = re.match(r'([A-Za-z]*)(.*)', vlan.strip())
+        items = [i for i in match.group(2).split(',') if i.strip()]
+    elif isinstance(vlan, list):
+        items = vlan
+    else:
+        raise AnsibleFilterError('value must be of type string, list or int, got %s' % type(vlan))
+
+    bitmap = 0
+
+    for item in items:
+        try:
+            if isinstance(item, int):
+                start = end = item
+            else:
+                tokens = str(item).split('-')
+                if len(tokens) == 1:
+                    start = end = int(tokens[0])
+                elif len(tokens) == 2:
+                    start, end = int(tokens[0]), int(tokens[1])
+                else:
+                    raise ValueError()
+        except ValueError:
+            raise AnsibleFilterError('unable to parse vlan %s' % item)
+
+        if not 0 <= start <= end <= VLAN_MAX:
+            raise AnsibleFilterError('invalid vlan range %s' % item)
+
+        bitmap |= ((1 << (end - start + 1)) - 1) << start
+
+    return bitmap
+
+
+def _gen_bitmap_ranges(bitmap):
+    while bitmap:
+        start = (bitmap & -bitmap).bit_length() - 1
+        run = bitmap >> start
+        end = start + ((run + 1) & -(run + 1)).bit_length() - 2
+        yield (start, end)
+        bitmap &= ~(((1 << (end - start + 1)) - 1) << start)
+
+
+def _vlan_ranges(bitmap):
+    return ','.join(['%d' % s if s == e else '%d-%d' % (s, e) for (s, e) in _gen_bitmap_ranges(bitmap)])
+
+
+def vlan_union(vlan, *others):
+    bitmap = _vlan_bitmap(vlan)
+    for other in others:
+        bitmap |= _vlan_bitmap(other)
+    return _vlan_ranges(bitmap)
+
+
+def vlan_intersect(vlan, *others):
+    bitmap = _vlan_bitmap(vlan)
+    for other in others:
+        bitmap &= _vlan_bitmap(other)
+    return _vlan_ranges(bitmap)
+
+
+def vlan_difference(vlan, *others):
+    bitmap = _vlan_bitmap(vlan)
+    for other in others:
+        bitmap &= ~_vlan_bitmap(other)
+    return _vlan_ranges(bitmap)
+
+
+def vlan_contains(vlan, other):
+    other = _vlan_bitmap(other)
+    return _vlan_bitmap(vlan) & other == other
+
+
 class FilterModule(object):
     ''' Network interface filter '''
 
@@ -108,6 +228,11 @@ class FilterModule(object):
         return {
             'interface_split': interface_split,
             'interface_range': interface_range,
+            'interface_compress': interface_compress,
             'vlan_compress': vlan_compress,
-            'vlan_expand': vlan_expand
+            'vlan_expand': vlan_expand,
+            'vlan_union': vlan_union,
+            'vlan_intersect': vlan_intersect,
+            'vlan_difference': vlan_difference,
+            'vlan_contains': vlan_contains
         }
@@ -0,0 +1,391 @@
+# (c) 2018, Ansible by Red Hat, inc
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Content addressed cache of parse results
+
+The facts of a parse only depend on the parser, the content and the
+variables the parser references, so the parsers look the facts up by a
+hash of the three before parsing.  Identical outputs of many devices, or
+an output that did not change since the last run, are then parsed once.
+
+The cache has two tiers.  The memory tier is a least recently used table
+of the process, it serves the parses repeated by one worker.  The disk
+tier is a directory shared by the workers and by successive runs, with one
+file per entry.  A hit refreshes the modification time of the file and
+the least recently used files are removed when the directory grows over
+its size limit.  The size of the entries is kept in the `size` file of the
+directory and updated on every write, so the directory is only walked
+when it grows over the limit.  Entries are stored as JSON, like the
+jsonfile fact cache of Ansible, so tuples in the facts are returned as
+lists on a hit.
+
+Every lookup appends one byte to the `stats` file of the directory, `m`
+for a memory hit, `d` for a disk hit and `x` for a miss, which is read by::
+
+    PYTHONPATH=<role_path>/lib python -m network_engine.cache [--reset] DIR
+"""
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import collections
+import fcntl
+import hashlib
+import json
+import os
+import sys
+import tempfile
+
+from ansible.module_utils.six import string_types
+from ansible.module_utils._text import to_bytes, to_text
+
+from network_engine.content import ContentView
+
+
+# bump when a change of the engines changes the facts of a parse
+CACHE_VERSION = 1
+
+MEMORY_ENTRIES = 128
+DISK_SIZE = 100 * 1024 * 1024
+
+ENTRY_SUFFIX = '.json'
+STATS_FILE = 'stats'
+SIZE_FILE = 'size'
+
+HIT_MEMORY = 'memory'
+HIT_DISK = 'disk'
+MISS = 'miss'
+
+STATS_CODES = {HIT_MEMORY: b'm', HIT_DISK: b'd', MISS: b'x'}
+
+
+def cache_key(*parts):
+    """ Return the hex digest of the parts
+
+    :param parts: strings, bytes, ContentView objects or values that can
+        be serialized as JSON
+    """
+    digest = hashlib.sha1(to_bytes('network_engine_cache:%d' % CACHE_VERSION))
+    for part in parts:
+        if isinstance(part, ContentView):
+            data = memoryview(part.buffer)[part.start:part.end]
+        elif isinstance(part, bytes):
+            data = part
+        elif isinstance(part, string_types):
+            data = to_bytes(part, errors='surrogate_or_strict')
+        else:
+            data = to_bytes(json.dumps(part, sort_keys=True, default=to_text), errors='surrogate_or_strict')
+        digest.update(to_bytes('%d:' % len(data)))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+_file_hashes = {}
+
+
+def file_hash(path):
+    """ Return the hash of the bytes of the file at path
+
+    The hash is kept for the process while the size and modification
+    time of the file are unchanged.
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime, stat.st_size)
+    try:
+        return _file_hashes[key]
+    except KeyError:
+        with open(to_bytes(path, errors='surrogate_or_strict'), 'rb') as f:
+            _file_hashes[key] = hashlib.sha1(f.read()).hexdigest()
+        return _file_hashes[key]
+
+
+class ParseCache(object):
+    """ Memory and disk tiers of cached parse results
+
+    :param path: directory of the disk tier, created if it does not exist,
+        None for the memory tier only
+    :param max_size: size in bytes the entries of the disk tier may take
+    """
+
+    # the memory tier is shared by all caches of the process
+    _memory = collections.OrderedDict()
+
+    def __init__(self, path=None, max_size=DISK_SIZE):
+        self.path = path
+        self.max_size = max_size
+        if path and not os.path.isdir(path):
+            os.makedirs(path, 0o700)
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, key[:2], key + ENTRY_SUFFIX)
+
+    def _remember(self, key, encoded):
+        self._memory.pop(key, None)
+        self._memory[key] = encoded
+        while len(self._memory) > MEMORY_ENTRIES:
+            self._memory.popitem(last=False)
+
+    def _record(self, outcome):
+        if not self.path:
+            return
+        try:
+            fd = os.open(os.path.join(self.path, STATS_FILE), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            try:
+                os.write(fd, STATS_CODES[outcome])
+            finally:
+                os.close(fd)
+        except OSError:
+            pass
+
+    def get(self, key):
+        """ Return the (outcome, facts) of a lookup
+
+        :returns: tuple of one of `memory`, `disk` or `miss` and the cached
+            facts, None on a miss
+        """
+        encoded = self._memory.pop(key, None)
+        outcome = HIT_MEMORY
+
+        if encoded is None and self.path:
+            path = self._entry_path(key)
+            try:
+                with open(path, 'rb') as f:
+                    encoded = to_text(f.read(), errors='surrogate_or_strict')
+                os.utime(path, None)
+                outcome = HIT_DISK
+            except (IOError, OSError):
+                encoded = None
+
+        if encoded is None:
+            self._record(MISS)
+            return MISS, None
+
+        self._remember(key, encoded)
+        self._record(outcome)
+        return outcome, json.loads(encoded)
+
+    def set(self, key, facts):
+        """ Store the facts of a parse
+        """
+        encoded = json.dumps(facts, sort_keys=True, default=to_text)
+        self._remember(key, encoded)
+
+        if not self.path:
+            return
+
+        path = self._entry_path(key)
+        directory = os.path.dirname(path)
+        data = to_bytes(encoded, errors='surrogate_or_strict')
+        try:
+            if not os.path.isdir(directory):
+                os.makedirs(directory, 0o700)
+            try:
+                replaced = os.stat(path).st_size
+            except OSError:
+                replaced = 0
+            fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.rename(tmp, path)
+            self.update_size(len(data) - replaced)
+        except (IOError, OSError):
+            return
+
+    def update_size(self, delta):
+        """ Add delta to the size of the entries and evict over the limit
+
+        The size is read and written under a lock of the `size` file, as
+        the workers share the directory.  When the file does not exist the
+        size is computed from the entries, and an eviction writes the size
+        of the remaining entries, which corrects the drift of concurrent
+        writes of one entry.
+
+        :returns: the size of the entries of the disk tier
+        """
+        fd = os.open(os.path.join(self.path, SIZE_FILE), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                total = int(os.read(fd, 32)) + delta
+            except ValueError:
+                total = sum(e[1] for e in self.entries())
+
+            if total > self.max_size:
+                total = self.evict()
+
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.ftruncate(fd, 0)
+            os.write(fd, to_bytes('%d' % total))
+        finally:
+            os.close(fd)
+        return total
+
+    def entries(self):
+        """ Return the (mtime, size, path) of the entries of the disk tier
+        """
+        entries = list()
+        for root, dirs, files in os.walk(self.path):
+            for filename in files:
+                if filename.endswith(ENTRY_SUFFIX):
+                    path = os.path.join(root, filename)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self):
+        """ Remove the least recently used entries over the size limit
+
+        The entries are removed until they take 90% of the limit, so the
+        next writes do not evict again right away.
+
+        :returns: the size of the remaining entries
+        """
+        entries = self.entries()
+        total = sum(e[1] for e in entries)
+        if total <= self.max_size:
+            return total
+
+        for mtime, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= self.max_size * 0.9:
+                break
+        return total
+
+    def report(self):
+        """ Return the statistics of the disk tier
+        """
+        counts = dict((code, 0) for code in STATS_CODES.values())
+        try:
+            with open(os.path.join(self.path, STATS_FILE), 'rb') as f:
+                for chunk in iter(lambda: f.read(65536), b''):
+                    for code in counts:
+                        counts[code] += chunk.count(code)
+        except (IOError, OSError):
+            pass
+
+        lookups = sum(counts.values())
+        hits = counts[b'm'] + counts[b'd']
+        entries = self.entries()
+        return {
+            'entries': len(entries),
+            'size': sum(e[1] for e in entries),
+            'lookups': lookups,
+            'memory_hits': counts[b'm'],
+            'disk_hits': counts[b'd'],
+            'misses': counts[b'x'],
+            'hit_rate': round(float(hits) / lookups, 4) if lookups else 0.0
+        }
+
+    def reset(self):
+        """ Clear the statistics of the disk tier
+        """
+        try:
+            os.remove(os.path.join(self.path, STATS_FILE))
+        except OSError:
+            pass
+
+
+def open_cache(setting, max_size=None):
+    """ Return the cache selected by the value of network_engine_parse_cache
+
+    :param setting: True for the memory tier only, or the directory of the
+        disk tier
+    :param max_size: size limit of the disk tier in bytes
+
+    :returns: the ParseCache or None if caching is not enabled
+    """
+    if not setting:
+        return None
+    if setting is True:
+        return ParseCache()
+    return ParseCache(os.path.expanduser(setting), int(max_size) if max_size else DISK_SIZE)
+
+
+def template_variables(tasks, exclude=()):
+    """ Return the sorted names of the variables the directives reference
+
+    The names are found in the Jinja2 expressions of the directives and of
+    their `when` conditions.  The names of the registered results, the
+    loop variables and the names in exclude are left out, they are set by
+    the parser itself.
+
+    :param tasks: the list of directives of a parser
+    :param exclude: names to leave out
+    """
+    from jinja2 import Environment, meta
+    from jinja2.exceptions import TemplateSyntaxError
+
+    env = Environment()
+    names = set()
+    local = set(exclude) | set(['item'])
+
+    stack = [tasks]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            for key, item in value.items():
+                if key == 'register' and isinstance(item, string_types):
+                    local.add(item)
+                elif key == 'extend' and isinstance(item, string_types):
+                    names.add(item.split('.')[0])
+                elif key == 'loop_control' and isinstance(item, dict) and item.get('loop_var'):
+                    local.add(item['loop_var'])
+                elif key == 'when' and isinstance(item, string_types):
+                    stack.append('{{ %s }}' % item)
+                else:
+                    stack.append(item)
+        elif isinstance(value, list):
+            stack.extend(value)
+        elif isinstance(value, string_types) and ('{{' in value or '{%' in value):
+            try:
+                names.update(meta.find_undeclared_variables(env.parse(value)))
+            except TemplateSyntaxError:
+                pass
+
+    return sorted(names - local)
+
+
+_variables = {}
+
+
+def parser_variables(path, tasks):
+    """ Return the hash of a parser file and the variables it references
+
+    :param path: path to the parser file
+    :param tasks: the list of directives loaded from the file
+    """
+    digest = file_hash(path)
+    if digest not in _variables:
+        _variables[digest] = template_variables(tasks, exclude=('content',))
+    return digest, _variables[digest]
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='report the statistics of a parse cache directory')
+    parser.add_argument('path', help='directory of the parse cache')
+    parser.add_argument('--reset', action='store_true', help='clear the statistics after the report')
+    args = parser.parse_args(argv)
+
+    cache = ParseCache(args.path)
+    report = cache.report()
+    for key in ('entries', 'size', 'lookups', 'memory_hits', 'disk_hits', 'misses', 'hit_rate'):
+        print('%-12s %s' % (key, report[key]))
+
+    if args.reset:
+        cache.reset()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
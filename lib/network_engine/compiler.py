@@ -0,0 +1,367 @@
+# (c) 2018, Ansible by Red Hat, inc
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Ahead of time compiler for command_parser templates
+
+The compiler walks one or more parser template files or directories,
+validates every directive and option, checks that every literal regular
+expression compiles and writes a versioned JSON artifact next to each
+template.  The `command_parser` action loads the artifact in place of the
+YAML source when it is up to date, so broken parsers are reported by the
+compile step instead of when the failing branch runs on a live host.  Regexes
+prone to catastrophic backtracking are reported as warnings.
+
+Usage::
+
+    PYTHONPATH=<role_path>/lib python -m network_engine.compiler [--check] PATH [PATH ...]
+"""
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import json
+import os
+import re
+import sys
+
+from ansible.module_utils.six import string_types
+from ansible.module_utils._text import to_bytes, to_text
+
+from network_engine.regex_backend import BACKENDS as REGEX_BACKENDS
+from network_engine.plugins.parser.json_select import PathSyntaxError, compile_path
+from network_engine.plugins.parser import xml_select
+from network_engine.watchdog import backtracking_risks
+
+
+ARTIFACT_VERSION = 1
+ARTIFACT_SUFFIX = '.compiled.json'
+
+VALID_FILE_EXTENSIONS = ('.yaml', '.yml', '.json')
+VALID_GROUP_DIRECTIVES = ('pattern_group', 'block')
+VALID_ACTION_DIRECTIVES = ('parser_metadata', 'pattern_match', 'table_match', 'json_select', 'xml_select', 'set_vars',
+                           'json_template')
+VALID_DIRECTIVES = VALID_GROUP_DIRECTIVES + VALID_ACTION_DIRECTIVES
+PATTERN_GROUP_DIRECTIVES = ('pattern_group', 'pattern_match', 'table_match', 'json_select', 'xml_select')
+VALID_EXPORT_AS = ('list', 'elements', 'dict', 'object', 'hash')
+
+DIRECTIVE_OPTIONS = ('name', 'register', 'extend', 'export', 'export_as', 'when', 'loop', 'loop_control')
+GROUP_OPTIONS = ('name', 'register', 'when', 'loop', 'loop_control')
+
+DIRECTIVE_ARGS = {
+    'parser_metadata': ('version', 'command', 'network_os', 'regex_backend'),
+    'pattern_match': ('regex', 'content', 'match_all', 'match_until', 'match_greedy', 'types'),
+    'table_match': ('content', 'header', 'columns', 'match_until', 'wrapped', 'types'),
+    'json_select': ('path', 'content'),
+    'xml_select': ('path', 'fields', 'content', 'types'),
+    'json_template': ('template',),
+}
+
+CAPTURE_TYPES = ('str', 'int', 'float', 'bool', 'mac', 'ip', 'prefix')
+
+TEMPLATE_RE = re.compile(r'{{|{%')
+
+
+class ParserCompileError(Exception):
+
+    def __init__(self, path, msg):
+        self.path = path
+        super(ParserCompileError, self).__init__('%s: %s' % (path, msg))
+
+
+def is_template(value):
+    return isinstance(value, string_types) and TEMPLATE_RE.search(value) is not None
+
+
+def artifact_path(path):
+    """ Return the path of the compiled artifact for a parser source file
+    """
+    if path.endswith(ARTIFACT_SUFFIX):
+        return path
+    return '%s%s' % (os.path.splitext(path)[0], ARTIFACT_SUFFIX)
+
+
+def source_stem(filename):
+    """ Return the parser name of a source or compiled artifact filename
+    """
+    if filename.endswith(ARTIFACT_SUFFIX):
+        return filename[:-len(ARTIFACT_SUFFIX)]
+    return os.path.splitext(filename)[0]
+
+
+class Compiler(object):
+
+    def __init__(self, path):
+        self.path = path
+        self.regexes = list()
+        self.warnings = list()
+
+    def fail(self, msg, name=None):
+        if name:
+            msg = 'directive [%s]: %s' % (name, msg)
+        raise ParserCompileError(self.path, msg)
+
+    def compile(self, tasks):
+        """ Validate the loaded parser and return the artifact data
+
+        :param tasks: the list of directives loaded from the parser file
+
+        :returns: dict object that can be serialized as the artifact
+        """
+        if not isinstance(tasks, list):
+            self.fail('parser must be a list of directives, got %s' % type(tasks).__name__)
+
+        for task in tasks:
+            self._validate_task(task)
+
+        return {
+            'network_engine_parser': ARTIFACT_VERSION,
+            'regexes': self.regexes,
+            'warnings': self.warnings,
+            'directives': tasks
+        }
+
+    def _split_task(self, task, options):
+        if not isinstance(task, dict):
+            self.fail('directive must be a hash, got %s' % type(task).__name__)
+
+        name = task.get('name')
+        directives = [k for k in task if k not in options]
+
+        if len(directives) != 1:
+            self.fail('expected exactly one directive, got %s' % (', '.join(sorted(directives)) or 'none'), name)
+
+        return name, directives[0]
+
+    def _validate_loop_control(self, task, name):
+        loop_control = task.get('loop_control')
+        if loop_control is not None:
+            if not isinstance(loop_control, dict) or not set(loop_control).issubset(('loop_var',)):
+                self.fail('loop_control only supports the loop_var option', name)
+
+    def _validate_task(self, task):
+        name, directive = self._split_task(task, DIRECTIVE_OPTIONS)
+
+        if directive not in VALID_DIRECTIVES + ('export_facts',):
+            self.fail('invalid directive in parser: %s' % directive, name)
+
+        export_as = task.get('export_as')
+        if export_as is not None and not is_template(export_as) and export_as not in VALID_EXPORT_AS:
+            self.fail('invalid value for export_as, got %s' % export_as, name)
+
+        self._validate_loop_control(task, name)
+        self._validate_directive(directive, task[directive], name)
+
+    def _validate_group(self, entries, name):
+        if not isinstance(entries, list):
+            self.fail('pattern_group must be a list of directives', name)
+
+        for entry in entries:
+            entry_name, directive = self._split_task(entry, GROUP_OPTIONS)
+            if directive not in PATTERN_GROUP_DIRECTIVES:
+                self.fail('invalid directive specified in pattern_group: %s' % directive, entry_name)
+            self._validate_loop_control(entry, entry_name)
+            self._validate_directive(directive, entry[directive], entry_name)
+
+    def _validate_directive(self, directive, args, name):
+        if directive in VALID_GROUP_DIRECTIVES:
+            return self._validate_group(args, name)
+
+        if not isinstance(args, dict):
+            self.fail('arguments for %s must be a hash' % directive, name)
+
+        valid_args = DIRECTIVE_ARGS.get(directive)
+        if valid_args is not None:
+            invalid = set(args).difference(valid_args)
+            if invalid:
+                self.fail('unsupported arguments for %s: %s' % (directive, ', '.join(sorted(invalid))), name)
+
+        if directive == 'pattern_match':
+            if 'regex' not in args:
+                self.fail('missing required argument regex', name)
+            for key in ('regex', 'match_until'):
+                self._validate_regex(args.get(key), name)
+            if 'types' in args:
+                self._validate_types(args['regex'], args['types'], name)
+
+        elif directive == 'table_match':
+            for key in ('header', 'match_until'):
+                self._validate_regex(args.get(key), name)
+            columns = args.get('columns')
+            if columns is not None and not is_template(columns):
+                if not isinstance(columns, list) or not all(isinstance(c, string_types) for c in columns):
+                    self.fail('table_match columns must be a list of column names', name)
+            if 'types' in args:
+                self._validate_types(None, args['types'], name)
+
+        elif directive == 'json_select':
+            if 'path' not in args:
+                self.fail('missing required argument path', name)
+            if not is_template(args['path']):
+                try:
+                    compile_path(args['path'])
+                except PathSyntaxError as exc:
+                    self.fail(str(exc), name)
+
+        elif directive == 'xml_select':
+            if 'path' not in args:
+                self.fail('missing required argument path', name)
+            fields = args.get('fields')
+            try:
+                if not is_template(args['path']):
+                    xml_select.compile_path(args['path'])
+                if fields is not None and not is_template(fields):
+                    if not isinstance(fields, dict):
+                        self.fail('xml_select fields must be a hash of key to field path', name)
+                    for field in fields.values():
+                        if not is_template(field):
+                            xml_select.compile_field(field)
+            except ValueError as exc:
+                self.fail(str(exc), name)
+            if 'types' in args:
+                self._validate_types(None, args['types'], name)
+
+        elif directive == 'parser_metadata':
+            backend = args.get('regex_backend')
+            if backend is not None and backend not in REGEX_BACKENDS:
+                self.fail('invalid regex_backend %s, expected one of %s' % (backend, ', '.join(sorted(REGEX_BACKENDS))), name)
+
+        elif directive == 'json_template':
+            if 'template' not in args:
+                self.fail('missing required argument template', name)
+            self._validate_json_template(args['template'], name)
+
+    def _validate_regex(self, regex, name):
+        if regex is None or is_template(regex):
+            return
+        try:
+            re.compile(regex)
+        except (re.error, TypeError) as exc:
+            self.fail('invalid regex %r: %s' % (regex, exc), name)
+        if regex not in self.regexes:
+            self.regexes.append(regex)
+            for reason in backtracking_risks(regex):
+                self.warnings.append('directive [%s]: regex %r %s' % (name, regex, reason))
+
+    def _validate_types(self, regex, types, name):
+        if not isinstance(types, dict):
+            self.fail('types must be a hash of named group to type', name)
+
+        for group, type_name in types.items():
+            if type_name not in CAPTURE_TYPES:
+                self.fail('invalid type %s for group %s, expected one of %s' % (type_name, group, ', '.join(CAPTURE_TYPES)), name)
+
+        if regex is not None and not is_template(regex):
+            unknown = set(types).difference(re.compile(regex).groupindex)
+            if unknown:
+                self.fail('types given for unknown groups: %s' % ', '.join(sorted(unknown)), name)
+
+    def _validate_json_template(self, template, name):
+        if not isinstance(template, list):
+            self.fail('json_template template must be a list', name)
+
+        for item in template:
+            if not isinstance(item, dict) or 'key' not in item:
+                self.fail('json_template entries require a key', name)
+            values = [k for k in ('value', 'object', 'elements') if k in item]
+            if len(values) != 1:
+                self.fail('json_template entry [%s] requires one of value, object or elements' % item['key'], name)
+            if values[0] in ('object', 'elements'):
+                self._validate_json_template(item[values[0]], name)
+
+
+def compile_file(path, loader, dest=None):
+    """ Compile a single parser file and write the artifact
+
+    :param path: path to the parser source file
+    :param loader: Ansible DataLoader used to read the source
+    :param dest: path of the artifact to write, None to only validate
+
+    :returns: the artifact data
+    """
+    tasks = loader.load_from_file(path)
+    artifact = Compiler(path).compile(tasks)
+
+    if dest:
+        stat = os.stat(path)
+        artifact['source'] = os.path.basename(path)
+        artifact['source_mtime'] = stat.st_mtime
+        artifact['source_size'] = stat.st_size
+
+        with open(to_bytes(dest, errors='surrogate_or_strict'), 'wb') as f:
+            f.write(to_bytes(json.dumps(artifact, sort_keys=True, indent=1)))
+
+    return artifact
+
+
+def load_artifact(path):
+    """ Load a compiled artifact if it is valid for this version
+
+    :param path: path to the compiled artifact
+
+    :returns: list of directives or None if the artifact cannot be used
+    """
+    try:
+        with open(to_bytes(path, errors='surrogate_or_strict'), 'rb') as f:
+            artifact = json.loads(to_text(f.read(), errors='surrogate_or_strict'))
+    except (IOError, OSError, ValueError):
+        return None
+
+    if not isinstance(artifact, dict) or artifact.get('network_engine_parser') != ARTIFACT_VERSION:
+        return None
+
+    source = artifact.get('source')
+    if source:
+        source = os.path.join(os.path.dirname(path), source)
+        if os.path.exists(source):
+            stat = os.stat(source)
+            if (stat.st_mtime, stat.st_size) != (artifact.get('source_mtime'), artifact.get('source_size')):
+                return None
+
+    return artifact['directives']
+
+
+def find_sources(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for filename in sorted(files):
+                    if filename.endswith(ARTIFACT_SUFFIX):
+                        continue
+                    if os.path.splitext(filename)[1] in VALID_FILE_EXTENSIONS:
+                        yield os.path.join(root, filename)
+        else:
+            yield path
+
+
+def main(argv=None):
+    import argparse
+    from ansible.parsing.dataloader import DataLoader
+
+    parser = argparse.ArgumentParser(description='validate and compile command_parser templates')
+    parser.add_argument('paths', nargs='+', help='parser template files or directories')
+    parser.add_argument('--check', action='store_true', help='validate only, do not write artifacts')
+    args = parser.parse_args(argv)
+
+    loader = DataLoader()
+    failed = 0
+
+    for path in find_sources(args.paths):
+        dest = None if args.check else artifact_path(path)
+        try:
+            artifact = compile_file(path, loader, dest)
+        except Exception as exc:
+            failed += 1
+            print('FAILED %s' % exc, file=sys.stderr)
+        else:
+            print('ok %s (%d directives, %d regexes)' % (dest or path, len(artifact['directives']), len(artifact['regexes'])))
+            for msg in artifact['warnings']:
+                print('WARNING %s: %s' % (path, msg), file=sys.stderr)
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
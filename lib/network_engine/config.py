@@ -0,0 +1,262 @@
+# (c) 2018, Ansible by Red Hat, inc
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import re
+
+from ansible.module_utils.six import string_types
+from ansible.module_utils._text import to_bytes, to_native
+
+
+# same defaults as ansible.module_utils.network.common.config, which is not
+# imported because of the cost of its module_utils.basic dependency
+DEFAULT_COMMENT_TOKENS = ['#', '!', '/*', '*/', 'echo']
+
+DEFAULT_IGNORE_LINES_RE = [
+    re.compile(r"Using \d+ out of \d+ bytes"),
+    re.compile(r"Building configuration"),
+    re.compile(r"Current configuration : \d+ bytes")
+]
+
+TOPLEVEL_RE = re.compile(r'\S')
+CHILDLINE_RE = re.compile(r'^\s*(.+)$')
+ENTRY_RE = re.compile(r'([{};])')
+
+
+class ConfigLine(object):
+    """ A single line of configuration text
+
+    The line is identified by its `line` key, which is the text of all of
+    its parents and the line itself joined by a space.  This is the same
+    value `NetworkConfig` uses to compare two lines, except that here it is
+    computed once when the line is parsed rather than on every comparison.
+    """
+
+    __slots__ = ('text', 'raw', 'line', 'parents', 'children')
+
+    def __init__(self, raw, parents=None):
+        self.raw = raw
+        self.text = raw.strip()
+        self.parents = parents or []
+        self.children = []
+
+        if self.parents:
+            self.line = '%s %s' % (self.parents[-1].line, self.text)
+        else:
+            self.line = self.text
+
+    def __str__(self):
+        return self.raw
+
+    def __repr__(self):
+        return '<ConfigLine %r>' % self.line
+
+    @property
+    def has_parents(self):
+        return len(self.parents) > 0
+
+
+class IndexedConfig(object):
+    """ Parsed network configuration indexed for fast line lookups
+
+    The configuration text is parsed with the same rules as the Ansible
+    `NetworkConfig` object and every line is stored in a hash index keyed by
+    its parent path and text.  Diffing two configurations is then a hash
+    lookup per line instead of a scan of the other configuration.
+
+    :param indent: indentation used by the configuration blocks
+    :param contents: configuration text or an iterable of lines to load
+    :param ignore_lines: list of regexes to ignore when loading
+    """
+
+    def __init__(self, indent=1, contents=None, ignore_lines=None):
+        self._indent = indent
+        self._items = list()
+        self._index = set()
+
+        self._ignore_lines_re = list(DEFAULT_IGNORE_LINES_RE)
+        if ignore_lines:
+            if isinstance(ignore_lines, string_types):
+                ignore_lines = [ignore_lines]
+            for item in ignore_lines:
+                if isinstance(item, string_types):
+                    item = re.compile(item)
+                self._ignore_lines_re.append(item)
+
+        if contents:
+            self.load(contents)
+
+    @property
+    def items(self):
+        return self._items
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, obj):
+        return obj.line in self._index
+
+    def _ignore_line(self, text):
+        for item in DEFAULT_COMMENT_TOKENS:
+            if text.startswith(item):
+                return True
+        for regex in self._ignore_lines_re:
+            if regex.match(text):
+                return True
+        return False
+
+    def load(self, contents):
+        """ Parse the configuration into the indexed line list
+
+        :param contents: configuration text or any iterable of lines, such
+            as an open file object
+        """
+        if isinstance(contents, string_types):
+            contents = to_native(contents, errors='surrogate_or_strict').split('\n')
+
+        ancestors = list()
+        indents = [0]
+
+        for line in contents:
+            line = to_native(line, errors='surrogate_or_strict').rstrip('\n')
+            text = ENTRY_RE.sub('', line).strip()
+
+            if not text or self._ignore_line(text):
+                continue
+
+            # handle top level commands
+            if TOPLEVEL_RE.match(line):
+                cfg = ConfigLine(line)
+                ancestors = [cfg]
+                indents = [0]
+
+            # handle sub level commands
+            else:
+                line_indent = CHILDLINE_RE.match(line).start(1)
+
+                if line_indent < indents[-1]:
+                    while indents[-1] > line_indent:
+                        indents.pop()
+
+                if line_indent > indents[-1]:
+                    indents.append(line_indent)
+
+                curlevel = len(indents) - 1
+                parent_level = curlevel - 1
+
+                cfg = ConfigLine(line, ancestors[:curlevel])
+
+                if curlevel <= len(ancestors):
+                    del ancestors[curlevel:]
+                    ancestors.append(cfg)
+                    ancestors[parent_level].children.append(cfg)
+
+            self._items.append(cfg)
+            self._index.add(cfg.line)
+
+    def expand_block(self, obj):
+        """ Return the line and all of its children in configuration order
+        """
+        block = list()
+        visited = set()
+        stack = [obj]
+
+        while stack:
+            item = stack.pop()
+            if item is not obj and item.line in visited:
+                continue
+            block.append(item)
+            visited.add(item.line)
+            stack.extend(reversed(item.children))
+
+        return block
+
+    def _diff_line(self, other):
+        return [item for item in self._items if item not in other]
+
+    def _diff_strict(self, other):
+        updates = list()
+        other = other.items
+        for index, item in enumerate(self._items):
+            if index >= len(other) or item.text != other[index].text:
+                updates.append(item)
+        return updates
+
+    def _diff_exact(self, other):
+        if len(other) != len(self._items):
+            return list(self._items)
+        for ours, theirs in zip(self._items, other.items):
+            if ours.line != theirs.line:
+                return list(self._items)
+        return list()
+
+    def difference(self, other, match='line', replace=None):
+        """ Perform a config diff against another indexed config
+
+        :param other: instance of IndexedConfig to diff against
+        :param match: type of diff to perform.  valid values are 'line',
+            'strict', 'exact'
+        :param replace: the method used to generate the replacement lines.
+            valid values are 'block', 'line'
+
+        :returns: list of ConfigLine objects that are different
+        """
+        meth = getattr(self, '_diff_%s' % match)
+        updates = meth(other)
+
+        if replace == 'block':
+            parents = list()
+            seen = set()
+            for item in updates:
+                if not item.has_parents:
+                    parents.append(item)
+                    seen.add(item.line)
+                else:
+                    for p in item.parents:
+                        if p.line not in seen:
+                            parents.append(p)
+                            seen.add(p.line)
+
+            updates = list()
+            for item in parents:
+                updates.extend(self.expand_block(item))
+
+        visited = set()
+        expanded = list()
+
+        for item in updates:
+            for p in item.parents:
+                if p.line not in visited:
+                    visited.add(p.line)
+                    expanded.append(p)
+            expanded.append(item)
+            visited.add(item.line)
+
+        return expanded
+
+
+def dumps(objects):
+    """ Return the diff objects as configuration commands
+    """
+    return '\n'.join([o.text for o in objects])
+
+
+def dump(objects, fp):
+    """ Write the diff objects as configuration commands to a file object
+
+    The commands are written one at a time so the output is never held in
+    memory as a single string.  The file content is the same as the value
+    returned by `dumps`.
+    """
+    for index, o in enumerate(objects):
+        if index:
+            fp.write(b'\n')
+        fp.write(to_bytes(o.text, errors='surrogate_or_strict'))
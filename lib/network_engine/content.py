@@ -0,0 +1,102 @@
+# (c) 2018, Ansible by Red Hat, inc
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Memory mapped content for command_parser
+
+A capture given to command_parser with `content_file` is mapped read only
+instead of being read into a string.  The content is a ContentView of the
+whole mapping, the pattern_match engine scans the mapped bytes in place and
+the sections returned by `match_greedy` are views of a range of the same
+mapping, so only the captured values are decoded.
+"""
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import collections
+import mmap
+import os
+
+from ansible.module_utils.six import PY3, iteritems
+from ansible.module_utils._text import to_bytes, to_text
+
+
+class ContentView(object):
+    """ A range of a buffer that is decoded only when needed
+
+    :param buffer: the mmap or bytes object that holds the content
+    :param start: offset of the first byte of the range
+    :param end: offset after the last byte of the range, the end of the
+        buffer when not set
+    """
+
+    __slots__ = ('buffer', 'start', 'end', '_text')
+
+    def __init__(self, buffer, start=0, end=None):
+        self.buffer = buffer
+        self.start = start
+        self.end = len(buffer) if end is None else end
+        self._text = None
+
+    @property
+    def text(self):
+        """ The decoded content of the range, decoded once
+        """
+        if self._text is None:
+            self._text = to_text(self.buffer[self.start:self.end], errors='surrogate_or_strict')
+        return self._text
+
+    def __len__(self):
+        return self.end - self.start
+
+    def __repr__(self):
+        return '<ContentView %d:%d>' % (self.start, self.end)
+
+    if PY3:
+        def __str__(self):
+            return self.text
+    else:
+        def __str__(self):
+            return to_bytes(self.text, errors='surrogate_or_strict')
+
+        def __unicode__(self):
+            return self.text
+
+
+def open_content(path):
+    """ Map the file at path read only
+
+    :param path: path to the file
+
+    :returns: ContentView of the whole file
+    """
+    with open(to_bytes(path, errors='surrogate_or_strict'), 'rb') as f:
+        # an empty file cannot be mapped
+        if not os.fstat(f.fileno()).st_size:
+            return ContentView(b'')
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return ContentView(buffer)
+
+
+def is_view(value):
+    """ Return True if value is a ContentView or a list of them
+    """
+    if isinstance(value, ContentView):
+        return True
+    if isinstance(value, list) and value:
+        return all(isinstance(v, ContentView) for v in value)
+    return False
+
+
+def resolve_views(data):
+    """ Return data with every ContentView replaced by its text
+    """
+    if isinstance(data, ContentView):
+        return data.text
+    elif isinstance(data, collections.Mapping):
+        return dict((k, resolve_views(v)) for k, v in iteritems(data))
+    elif isinstance(data, (list, tuple)):
+        return [resolve_views(v) for v in data]
+    return data
@@ -0,0 +1,180 @@
+# (c) 2018, Ansible by Red Hat, inc
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Helpers for the facts exported by the parsers
+
+Parsed facts repeat the same short values many times, such as interface
+types, `up` and `down` or speeds, and every occurrence is a separate
+object.  intern_facts() replaces equal scalars with one shared object.
+Objects shared in a task result stay shared when the result is pickled
+from the worker to the controller, so the interning carries over to the
+facts the controller keeps for every host.
+
+delta_facts() compares new facts with the current facts of the host by the
+structural hash of every top level fact and keeps only the facts that
+changed.  The controller replaces a top level fact as a whole when it
+merges the facts of a task, so that is the smallest unit that can be
+returned; the paths that changed inside are reported in a summary.
+"""
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import collections
+import hashlib
+import json
+
+from ansible.module_utils.six import integer_types, iteritems, string_types
+from ansible.module_utils._text import to_bytes, to_text
+
+
+INTERN_MAX_ENTRIES = 65536
+INTERN_MAX_LENGTH = 64
+
+DELTA_MAX_PATHS = 100
+
+
+class InternTable(object):
+    """ Bounded table of the canonical object of scalar values
+
+    Only strings up to max_length characters and numbers are interned.
+    Once the table holds max_entries values new values are no longer
+    added, values already in the table are still shared.
+
+    :param max_entries: maximum number of values in the table
+    :param max_length: maximum length of an interned string
+    """
+
+    def __init__(self, max_entries=INTERN_MAX_ENTRIES, max_length=INTERN_MAX_LENGTH):
+        self.max_entries = max_entries
+        self.max_length = max_length
+        self.hits = 0
+        self._values = {}
+
+    def __len__(self):
+        return len(self._values)
+
+    def intern(self, value):
+        """ Return the canonical object of value
+        """
+        if isinstance(value, string_types):
+            if len(value) > self.max_length:
+                return value
+            key = value
+        elif isinstance(value, integer_types + (float,)) and not isinstance(value, bool):
+            # 1, 1.0 and True are equal keys, so numbers are keyed by type
+            key = (type(value), value)
+        else:
+            return value
+
+        canonical = self._values.get(key)
+        if canonical is None:
+            if len(self._values) < self.max_entries:
+                self._values[key] = value
+            return value
+
+        if canonical is not value:
+            self.hits += 1
+        return canonical
+
+    def intern_facts(self, data):
+        """ Return data with the keys and scalar values interned
+        """
+        if isinstance(data, collections.Mapping):
+            return dict((self.intern(k), self.intern_facts(v)) for k, v in iteritems(data))
+        elif isinstance(data, list):
+            return [self.intern_facts(v) for v in data]
+        elif isinstance(data, tuple):
+            return tuple(self.intern_facts(v) for v in data)
+        return self.intern(data)
+
+
+_table = None
+
+
+def intern_facts(data):
+    """ Intern data with the table of this process
+    """
+    global _table
+    if _table is None:
+        _table = InternTable()
+    return _table.intern_facts(data)
+
+
+def fact_hash(data):
+    """ Return the structural hash of data
+
+    Equal structures have the same hash whatever the order of their keys.
+    """
+    encoded = json.dumps(data, sort_keys=True, separators=(',', ':'), default=to_text)
+    return hashlib.sha1(to_bytes(encoded, errors='surrogate_or_strict')).hexdigest()
+
+
+def join_path(path, key):
+    """ Return the path of key in the value at path, `a.b` or `a[0]`
+    """
+    if isinstance(key, integer_types):
+        return '%s[%d]' % (path, key)
+    return '%s.%s' % (path, key) if path else to_text(key)
+
+
+def _diff_paths(old, new, path, summary):
+    if old == new:
+        return
+
+    if isinstance(old, collections.Mapping) and isinstance(new, collections.Mapping):
+        for key in new:
+            if key not in old:
+                summary['added'].append(join_path(path, key))
+            else:
+                _diff_paths(old[key], new[key], join_path(path, key), summary)
+        for key in old:
+            if key not in new:
+                summary['removed'].append(join_path(path, key))
+
+    elif isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        for index, (old_item, new_item) in enumerate(zip(old, new)):
+            _diff_paths(old_item, new_item, join_path(path, index), summary)
+
+    else:
+        summary['changed'].append(path)
+
+
+def delta_facts(current, facts, max_paths=DELTA_MAX_PATHS):
+    """ Return the facts that differ from the current facts of the host
+
+    :param current: the current facts of the host
+    :param facts: the facts returned by the task
+    :param max_paths: maximum number of paths listed in the summary for
+        each of added, removed and changed
+
+    :returns: tuple of the changed facts and the change summary
+    """
+    delta = {}
+    summary = {'changed_facts': [], 'unchanged_facts': [], 'added': [], 'removed': [], 'changed': []}
+
+    for key, value in iteritems(facts):
+        if key in current and fact_hash(current[key]) == fact_hash(value):
+            summary['unchanged_facts'].append(key)
+            continue
+
+        delta[key] = value
+        summary['changed_facts'].append(key)
+        if key in current:
+            _diff_paths(current[key], value, key, summary)
+        else:
+            summary['added'].append(key)
+
+    summary['truncated'] = False
+    for name in ('added', 'removed', 'changed'):
+        paths = sorted(summary[name])
+        if len(paths) > max_paths:
+            summary['truncated'] = True
+            paths = paths[:max_paths]
+        summary[name] = paths
+    summary['changed_facts'].sort()
+    summary['unchanged_facts'].sort()
+
+    return delta, summary
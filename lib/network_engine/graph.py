@@ -0,0 +1,211 @@
+# (c) 2018, Ansible by Red Hat, inc
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Dependency graph of the directives of a parser
+
+Every directive produces the variables it registers, or the keys it sets
+with `set_vars` when it has no register, and references the variables of
+its templates, of `when` and of `loop`.  A directive depends on the
+directives before it that produce a variable it references.
+
+The directives that export facts, and `parser_metadata` for its checks,
+are live, as are the directives they depend on.  The other directives
+cannot change the facts of the parser and are pruned.  The live
+directives that share no variable form independent chains, which the
+report lists.
+
+When a template looks variables up by name, with `vars`, `hostvars` or
+the `vars` lookup, the references cannot be known and nothing is pruned.
+"""
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import collections
+import re
+
+from ansible.module_utils.six import string_types
+
+from network_engine.cache import template_variables
+
+
+DIRECTIVE_OPTIONS = ('name', 'register', 'extend', 'export', 'export_as', 'when', 'loop', 'loop_control')
+
+# directives that are run for their side effects
+SIDE_EFFECT_DIRECTIVES = ('parser_metadata',)
+
+DYNAMIC_NAMES = frozenset(('vars', 'hostvars'))
+DYNAMIC_LOOKUP_RE = re.compile(r'''\b(?:lookup|query|q)\s*\(\s*['"](?:vars|varnames)['"]''')
+
+
+def _strings(value):
+    stack = [value]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            stack.extend(value.keys())
+            stack.extend(value.values())
+        elif isinstance(value, list):
+            stack.extend(value)
+        elif isinstance(value, string_types):
+            yield value
+
+
+def _is_exported(value):
+    if isinstance(value, string_types):
+        return value.strip().lower() not in ('', 'no', 'false', 'off', '0', 'n')
+    return bool(value)
+
+
+class Node(object):
+    """ A directive of the graph
+
+    :param index: the position of the directive in the parser
+    :param task: the directive
+    """
+
+    def __init__(self, index, task):
+        self.index = index
+        self.name = task.get('name')
+        directives = [k for k in task if k not in DIRECTIVE_OPTIONS]
+        self.directive = directives[0] if len(directives) == 1 else None
+
+        register = task.get('register')
+        args = task.get(self.directive) if self.directive else None
+
+        if register:
+            self.produces = set([register])
+        elif self.directive in ('set_vars', 'export_facts') and isinstance(args, dict):
+            self.produces = set(k for k in args if isinstance(k, string_types))
+        else:
+            self.produces = set()
+
+        # a directive that registers a variable it reads still depends on
+        # the directive that produced it first
+        self.references = set(template_variables([dict((k, v) for k, v in task.items() if k != 'register')]))
+        self.dynamic = bool(self.references & DYNAMIC_NAMES) or \
+            any(DYNAMIC_LOOKUP_RE.search(s) for s in _strings(task))
+
+        self.root = self.directive is None or self.directive in SIDE_EFFECT_DIRECTIVES or \
+            self.directive == 'export_facts' or _is_exported(task.get('export', False))
+
+        self.depends = set()
+
+    def label(self):
+        return self.name or '%s #%d' % (self.directive, self.index + 1)
+
+
+class DirectiveGraph(object):
+    """ Dependency graph of the directives of a parser
+
+    :param tasks: the list of directives of the parser
+    """
+
+    def __init__(self, tasks):
+        self.nodes = [Node(index, task) for index, task in enumerate(tasks if isinstance(tasks, list) else [])]
+        self.dynamic = any(node.dynamic for node in self.nodes)
+
+        producers = {}
+        for node in self.nodes:
+            for name in node.references:
+                node.depends.update(producers.get(name, ()))
+            for name in node.produces:
+                producers.setdefault(name, set()).add(node.index)
+
+        self.live = set()
+        if self.dynamic:
+            self.live.update(node.index for node in self.nodes)
+        else:
+            stack = [node.index for node in self.nodes if node.root]
+            while stack:
+                index = stack.pop()
+                if index not in self.live:
+                    self.live.add(index)
+                    stack.extend(self.nodes[index].depends)
+
+    def live_indexes(self):
+        """ Return the sorted positions of the live directives
+        """
+        return sorted(self.live)
+
+    def pruned(self):
+        """ Return the name, directive and reason of the pruned directives
+        """
+        pruned = list()
+        for node in self.nodes:
+            if node.index in self.live:
+                continue
+            if node.produces:
+                reason = 'registers %s, which is not exported or referenced by an exported directive' \
+                    % ', '.join(sorted(node.produces))
+            else:
+                reason = 'has no register and is not exported'
+            pruned.append({'name': node.label(), 'directive': node.directive, 'reason': reason})
+        return pruned
+
+    def chains(self):
+        """ Return the independent chains of live directives
+
+        Two live directives are in the same chain when one depends on the
+        other, directly or through other directives, or when both produce
+        the same variable.  The chains share no variable, so they can be
+        evaluated in any order.
+
+        :returns: list of the lists of directive names of every chain, in
+            parser order
+        """
+        if self.dynamic:
+            return [[node.label() for node in self.nodes]]
+
+        parent = dict((index, index) for index in self.live)
+
+        def find(index):
+            while parent[index] != index:
+                parent[index] = parent[parent[index]]
+                index = parent[index]
+            return index
+
+        writers = {}
+        for index in self.live:
+            for dep in self.nodes[index].depends:
+                if dep in self.live:
+                    parent[find(index)] = find(dep)
+            for name in self.nodes[index].produces:
+                writer = writers.setdefault(name, index)
+                parent[find(index)] = find(writer)
+
+        chains = collections.OrderedDict()
+        for index in sorted(self.live):
+            chains.setdefault(find(index), []).append(self.nodes[index].label())
+        return list(chains.values())
+
+    def report(self):
+        """ Return the debug report of the graph
+        """
+        report = {
+            'directives': len(self.nodes),
+            'live': len(self.live),
+            'pruned': self.pruned(),
+            'chains': self.chains(),
+        }
+        if self.dynamic:
+            report['dynamic'] = [node.label() for node in self.nodes if node.dynamic]
+        return report
+
+
+_graphs = {}
+
+
+def parser_graph(digest, tasks):
+    """ Return the graph of the directives of a parser
+
+    :param digest: hash of the parser file the graph is kept for
+    :param tasks: the directives of the parser
+    """
+    try:
+        return _graphs[digest]
+    except KeyError:
+        graph = _graphs[digest] = DirectiveGraph(tasks)
+        return graph
@@ -0,0 +1,264 @@
+# (c) 2018, Ansible by Red Hat, inc
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Command to parser index for command_parser templates
+
+The index maps the `command` declared in the `parser_metadata` directive
+of every parser template under a directory to the template file, so the
+parser for a command can be found without listing the directory and
+loading every template.  Commands are matched after normalization and
+may be abbreviated the way network operating systems accept them, for
+instance `sh ip int br` matches `show ip interface brief`.  A word of the
+command of a template also matches the same word with a trailing `s`, so
+`show interface` matches the `show interfaces` header of a tech-support
+section.
+
+Action plugins run in a new worker process for every task, so the index
+is also saved to INDEX_FILENAME in the indexed directory and only rebuilt
+when a file or directory in it changes.
+"""
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import json
+import os
+import re
+
+from ansible.module_utils._text import to_bytes, to_text
+
+from network_engine import compiler
+from network_engine.utils import to_list
+
+
+INDEX_VERSION = 1
+INDEX_FILENAME = '.parser_index'
+
+VERSION_RE = re.compile(r'\d+')
+
+
+class ParserIndexError(Exception):
+    pass
+
+
+def normalize_command(command):
+    """ Return the command as a tuple of lower case words
+
+    Output modifiers such as `| include foo` do not change which parser
+    applies to the output and are removed.
+    """
+    command = to_text(command, errors='surrogate_or_strict').split('|')[0]
+    return tuple(command.lower().split())
+
+
+def _version_key(version):
+    return tuple(int(i) for i in VERSION_RE.findall(to_text(version or '')))
+
+
+def _abbreviates(words, command):
+    if len(words) != len(command):
+        return False
+    for word, full in zip(words, command):
+        if not full.startswith(word) and word != full + 's':
+            return False
+    return True
+
+
+class ParserIndex(object):
+    """ Index of parser templates keyed by command
+
+    :param path: the directory the index was built for
+    :param entries: list of dict objects with the keys command,
+        network_os, version and path (relative to the indexed directory)
+    :param stamps: dict of relative path to the stat values used to check
+        the index is up to date
+    """
+
+    def __init__(self, path, entries=None, stamps=None):
+        self.path = path
+        self.entries = entries or list()
+        self.stamps = stamps or dict()
+
+    @classmethod
+    def build(cls, path, load):
+        """ Build the index by loading every parser template in path
+
+        :param path: directory containing the parser templates
+        :param load: callable that returns the list of directives of a
+            parser file
+
+        :returns: instance of ParserIndex
+        """
+        entries = list()
+        stamps = dict()
+
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            relroot = os.path.relpath(root, path)
+            stamps[relroot] = os.stat(root).st_mtime
+
+            stems = set(compiler.source_stem(f) for f in files
+                        if not f.endswith(compiler.ARTIFACT_SUFFIX) and os.path.splitext(f)[1] in compiler.VALID_FILE_EXTENSIONS)
+
+            for filename in sorted(files):
+                if os.path.splitext(filename)[1] not in compiler.VALID_FILE_EXTENSIONS:
+                    continue
+
+                # the artifact is only indexed when its source is not present
+                if filename.endswith(compiler.ARTIFACT_SUFFIX) and compiler.source_stem(filename) in stems:
+                    continue
+
+                filepath = os.path.join(root, filename)
+                relpath = os.path.normpath(os.path.join(relroot, filename))
+                stat = os.stat(filepath)
+                stamps[relpath] = [stat.st_mtime, stat.st_size]
+
+                try:
+                    tasks = load(filepath)
+                except Exception:
+                    continue
+
+                for task in to_list(tasks):
+                    if isinstance(task, dict) and isinstance(task.get('parser_metadata'), dict):
+                        metadata = task['parser_metadata']
+                        break
+                else:
+                    continue
+
+                for command in to_list(metadata.get('command')):
+                    if compiler.is_template(command):
+                        continue
+                    entries.append({
+                        'command': ' '.join(normalize_command(command)),
+                        'network_os': metadata.get('network_os'),
+                        'version': to_text(metadata.get('version') or ''),
+                        'path': relpath
+                    })
+
+        return cls(path, entries, stamps)
+
+    @classmethod
+    def load(cls, path):
+        """ Load the saved index for path
+
+        :returns: instance of ParserIndex or None if there is no usable
+            saved index
+        """
+        filename = os.path.join(path, INDEX_FILENAME)
+        try:
+            with open(to_bytes(filename, errors='surrogate_or_strict'), 'rb') as f:
+                data = json.loads(to_text(f.read(), errors='surrogate_or_strict'))
+        except (IOError, OSError, ValueError):
+            return None
+
+        if not isinstance(data, dict) or data.get('network_engine_index') != INDEX_VERSION:
+            return None
+
+        return cls(path, data.get('entries'), data.get('stamps'))
+
+    def save(self):
+        """ Save the index in the indexed directory
+
+        The index file is created empty before the directory is stamped so
+        that writing it does not make the index out of date.  Errors are
+        ignored, the index is then rebuilt by the next task.
+        """
+        filename = to_bytes(os.path.join(self.path, INDEX_FILENAME), errors='surrogate_or_strict')
+        try:
+            if not os.path.exists(filename):
+                open(filename, 'a').close()
+                self.stamps['.'] = os.stat(self.path).st_mtime
+
+            data = {'network_engine_index': INDEX_VERSION, 'entries': self.entries, 'stamps': self.stamps}
+            with open(filename, 'wb') as f:
+                f.write(to_bytes(json.dumps(data, sort_keys=True)))
+        except (IOError, OSError):
+            pass
+
+    def is_current(self):
+        """ Return True if no file or directory changed since the index was built
+        """
+        try:
+            for relpath, stamp in self.stamps.items():
+                stat = os.stat(os.path.join(self.path, relpath))
+                if isinstance(stamp, list):
+                    if [stat.st_mtime, stat.st_size] != stamp:
+                        return False
+                elif stat.st_mtime != stamp:
+                    return False
+        except OSError:
+            return False
+        return True
+
+    def match(self, command, network_os=None):
+        """ Return the path of the parser for command
+
+        Parsers that match the command exactly are preferred over parsers
+        matched by abbreviation, parsers for the given network_os over
+        parsers without one and newer versions over older ones.
+
+        :param command: the command the output was produced by
+        :param network_os: the network_os of the device
+
+        :returns: the absolute path of the parser or None if no parser
+            matches the command
+        """
+        words = normalize_command(command)
+        if not words:
+            return None
+
+        candidates = list()
+        for entry in self.entries:
+            if entry['network_os'] not in (None, network_os):
+                continue
+
+            full = tuple(entry['command'].split())
+            if full == words:
+                exact = True
+            elif _abbreviates(words, full):
+                exact = False
+            else:
+                continue
+
+            candidates.append((exact, entry['network_os'] is not None, _version_key(entry['version']), entry))
+
+        if not candidates:
+            return None
+
+        if not any(c[0] for c in candidates):
+            commands = sorted(set(c[3]['command'] for c in candidates))
+            if len(commands) > 1:
+                raise ParserIndexError('ambiguous command `%s`, matches %s' % (' '.join(words), ', '.join(commands)))
+
+        best = max(candidates, key=lambda c: c[:3])
+        return os.path.join(self.path, best[3]['path'])
+
+
+_indexes = {}
+
+
+def get_index(path, load):
+    """ Return an up to date index for the parser templates in path
+
+    The index is taken from the process cache or the saved index file if
+    it is current, and rebuilt and saved otherwise.
+
+    :param path: directory containing the parser templates
+    :param load: callable that returns the list of directives of a parser
+        file, used when the index needs to be rebuilt
+
+    :returns: instance of ParserIndex
+    """
+    path = os.path.abspath(path)
+
+    index = _indexes.get(path)
+    if index is None or not index.is_current():
+        index = ParserIndex.load(path)
+        if index is None or not index.is_current():
+            index = ParserIndex.build(path, load)
+            index.save()
+        _indexes[path] = index
+
+    return index
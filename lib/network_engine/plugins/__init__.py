@@ -24,3 +24,28 @@ parser_loader = PluginLoader(
     'parser_plugins',
     # required_base_class='ParserBase'
 )
+
+
+_engines = {}
+
+
+def get_engine(loader, name):
+    """Return the engine class for name
+
+    The class is resolved through the plugin loader the first time it is
+    requested and cached for the life of the process, so engines that are
+    created for every directive do not go through the loader each time.
+
+    :param loader: the PluginLoader for the engine type
+    :param name: the name of the engine plugin
+
+    :returns: the engine class or None if the engine does not exist
+    """
+    key = (loader.package, name)
+    try:
+        return _engines[key]
+    except KeyError:
+        cls = loader.get(name, class_only=True)
+        if cls is not None:
+            _engines[key] = cls
+        return cls
@@ -0,0 +1,383 @@
+# (c) 2018, Ansible by Red Hat, inc
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Path expressions over structured content
+
+The expressions follow the JMESPath notation for the common cases::
+
+    TABLE_interface.ROW_interface[*]                 every row
+    TABLE_interface.ROW_interface[0]                 the first row
+    interfaces.*                                     every value of a hash
+    TABLE_interface.ROW_interface[?state == 'up']    the rows that match
+    ...[?mtu >= 9000 && name =~ '^Eth']              combined conditions
+    ...[*].{name: interface, mtu: eth_mtu}           projection of fields
+
+A wildcard or a filter turns the rest of the expression into a projection
+that is applied to every selected value, and the result is the list of the
+values that were found, flattened across nested wildcards.  Without one
+the result is the single value or None.  List steps treat a hash as a list
+of one item, as NX-OS returns a single ROW_ entry as a hash.
+
+Expressions are compiled once per process and evaluated on the native
+lists and hashes of the content, JSON text is decoded once per content.
+"""
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import json
+import re
+
+from ansible.module_utils.six import string_types
+from ansible.errors import AnsibleError
+
+from network_engine.content import ContentView
+
+
+TOKEN_RE = re.compile(r'''
+    \s*(?:
+        (?P<number>-?\d+(?:\.\d+)?)
+      | (?P<name>[A-Za-z_][\w-]*)
+      | "(?P<quoted>(?:[^"\\]|\\.)*)"
+      | '(?P<literal>(?:[^'\\]|\\.)*)'
+      | (?P<op>==|!=|<=|>=|=~|&&|\|\||[<>!.\[\]*?{}:,()])
+    )''', re.X)
+
+COMPARISONS = ('==', '!=', '<', '<=', '>', '>=', '=~')
+KEYWORDS = {'true': True, 'false': False, 'null': None}
+
+_MISSING = object()
+
+
+class PathSyntaxError(Exception):
+
+    def __init__(self, expression, msg):
+        super(PathSyntaxError, self).__init__('invalid path %r: %s' % (expression, msg))
+
+
+def tokenize(expression):
+    tokens = list()
+    pos = 0
+    end = len(expression.rstrip())
+    while pos < end:
+        match = TOKEN_RE.match(expression, pos)
+        if not match or match.end() == pos:
+            raise PathSyntaxError(expression, 'unexpected character at %d' % pos)
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'number':
+            value = float(value) if '.' in value else int(value)
+        elif kind in ('quoted', 'literal'):
+            value = re.sub(r'\\(.)', r'\1', value)
+        tokens.append((kind, value))
+        pos = match.end()
+    return tokens
+
+
+class _Parser(object):
+    """ Recursive descent parser of the path expressions
+
+    A path is compiled to a list of steps, the tuples (`key`, name),
+    (`index`, n), (`wildcard`,), (`values`,), (`filter`, condition) and
+    (`hash`, [(name, path)]).  Conditions are the tuples (`and`, a, b),
+    (`or`, a, b), (`not`, a), (`test`, path) and (`compare`, op, path,
+    value).
+    """
+
+    def __init__(self, expression):
+        self.expression = expression
+        self.tokens = tokenize(expression)
+        self.pos = 0
+
+    def fail(self, msg):
+        raise PathSyntaxError(self.expression, msg)
+
+    def peek(self, value=None):
+        if self.pos < len(self.tokens):
+            token = self.tokens[self.pos]
+            if value is None or (token[0] == 'op' and token[1] == value):
+                return token
+        return None
+
+    def take(self, value=None):
+        token = self.peek(value)
+        if token is None:
+            self.fail('expected %s' % (repr(value) if value else 'more input'))
+        self.pos += 1
+        return token
+
+    def parse(self):
+        steps = self.path()
+        if self.peek():
+            self.fail('unexpected %r' % (self.peek()[1],))
+        return steps
+
+    def path(self):
+        steps = list()
+        if self.peek('['):
+            steps.append(self.bracket())
+        else:
+            steps.append(self.field())
+
+        while True:
+            if self.peek('.'):
+                self.take('.')
+                if self.peek('{'):
+                    steps.append(self.projection())
+                    break
+                steps.append(self.field())
+            elif self.peek('['):
+                steps.append(self.bracket())
+            else:
+                break
+        return steps
+
+    def field(self):
+        kind, value = self.take()
+        if kind in ('name', 'quoted'):
+            return ('key', value)
+        if kind == 'op' and value == '*':
+            return ('values',)
+        if kind == 'op' and value == '{':
+            self.pos -= 1
+            return self.projection()
+        self.fail('expected a field name, got %r' % (value,))
+
+    def bracket(self):
+        self.take('[')
+        kind, value = self.take()
+        if kind == 'number' and isinstance(value, int):
+            step = ('index', value)
+        elif kind == 'op' and value == '*':
+            step = ('wildcard',)
+        elif kind == 'op' and value == '?':
+            step = ('filter', self.condition())
+        else:
+            self.fail('expected an index, * or ? in brackets, got %r' % (value,))
+        self.take(']')
+        return step
+
+    def projection(self):
+        self.take('{')
+        fields = list()
+        while True:
+            kind, name = self.take()
+            if kind not in ('name', 'quoted'):
+                self.fail('expected a key name in projection, got %r' % (name,))
+            self.take(':')
+            fields.append((name, self.path()))
+            if self.peek(','):
+                self.take(',')
+                continue
+            self.take('}')
+            return ('hash', fields)
+
+    def condition(self):
+        left = self.conjunction()
+        while self.peek('||'):
+            self.take('||')
+            left = ('or', left, self.conjunction())
+        return left
+
+    def conjunction(self):
+        left = self.negation()
+        while self.peek('&&'):
+            self.take('&&')
+            left = ('and', left, self.negation())
+        return left
+
+    def negation(self):
+        if self.peek('!'):
+            self.take('!')
+            return ('not', self.negation())
+        if self.peek('('):
+            self.take('(')
+            condition = self.condition()
+            self.take(')')
+            return condition
+
+        path = self.path()
+        token = self.peek()
+        if token and token[0] == 'op' and token[1] in COMPARISONS:
+            op = self.take()[1]
+            value = self.literal()
+            if op == '=~':
+                if not isinstance(value, string_types):
+                    self.fail('=~ expects a quoted regex')
+                try:
+                    value = re.compile(value)
+                except re.error as exc:
+                    self.fail('invalid regex %r: %s' % (value, exc))
+            return ('compare', op, path, value)
+        return ('test', path)
+
+    def literal(self):
+        kind, value = self.take()
+        if kind in ('number', 'literal', 'quoted'):
+            return value
+        if kind == 'name' and value in KEYWORDS:
+            return KEYWORDS[value]
+        self.fail('expected a literal value, got %r' % (value,))
+
+
+_PATHS = {}
+
+
+def compile_path(expression):
+    """ Return the compiled steps of a path expression
+
+    :raises PathSyntaxError: when the expression is not valid
+    """
+    try:
+        return _PATHS[expression]
+    except KeyError:
+        if not isinstance(expression, string_types) or not expression.strip():
+            raise PathSyntaxError(expression, 'path must be a non empty string')
+        steps = _PATHS[expression] = _Parser(expression).parse()
+        return steps
+
+
+def _as_list(value):
+    if isinstance(value, list):
+        return value
+    if isinstance(value, dict):
+        return [value]
+    return []
+
+
+def _number(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _compare(op, left, right):
+    if left is _MISSING:
+        left = None
+    if op == '==':
+        return left == right
+    if op == '!=':
+        return left != right
+    if op == '=~':
+        return isinstance(left, string_types) and right.search(left) is not None
+
+    left, right = _number(left), _number(right)
+    if left is None or right is None:
+        return False
+    if op == '<':
+        return left < right
+    if op == '<=':
+        return left <= right
+    if op == '>':
+        return left > right
+    return left >= right
+
+
+def _check(condition, node):
+    kind = condition[0]
+    if kind == 'and':
+        return _check(condition[1], node) and _check(condition[2], node)
+    if kind == 'or':
+        return _check(condition[1], node) or _check(condition[2], node)
+    if kind == 'not':
+        return not _check(condition[1], node)
+    if kind == 'test':
+        value = evaluate(condition[1], node)
+        return value is not _MISSING and value not in (None, False, '', [], {})
+    return _compare(condition[1], evaluate(condition[2], node), condition[3])
+
+
+def evaluate(steps, document):
+    """ Return the value the steps select in document
+
+    :returns: the list of selected values when the steps project, else the
+        selected value or _MISSING
+    """
+    nodes = [document]
+    projected = False
+
+    for step in steps:
+        kind = step[0]
+        selected = list()
+
+        for node in nodes:
+            if kind == 'key':
+                if isinstance(node, dict) and step[1] in node:
+                    selected.append(node[step[1]])
+            elif kind == 'index':
+                items = _as_list(node)
+                if -len(items) <= step[1] < len(items):
+                    selected.append(items[step[1]])
+            elif kind == 'wildcard':
+                selected.extend(_as_list(node))
+            elif kind == 'values':
+                if isinstance(node, dict):
+                    selected.extend(node.values())
+            elif kind == 'filter':
+                selected.extend(item for item in _as_list(node) if _check(step[1], item))
+            elif kind == 'hash':
+                row = dict()
+                for name, path in step[1]:
+                    value = evaluate(path, node)
+                    row[name] = None if value is _MISSING else value
+                selected.append(row)
+
+        if kind in ('wildcard', 'values', 'filter'):
+            projected = True
+        nodes = selected
+
+    if projected:
+        return nodes
+    return nodes[0] if nodes else _MISSING
+
+
+class ParserEngine(object):
+
+    # the last decoded JSON text, the directives of a parser share it
+    _decoded = (None, None)
+
+    def __init__(self, content):
+        self.content = content
+
+    def document(self):
+        """ Return the native structure of the content
+        """
+        content = self.content
+        if not isinstance(content, (string_types, ContentView)):
+            return content
+
+        cached, document = ParserEngine._decoded
+        if cached is content:
+            return document
+
+        text = content.text if isinstance(content, ContentView) else content
+        try:
+            document = json.loads(text)
+        except ValueError as exc:
+            raise AnsibleError('json_select requires structured content or JSON text: %s' % exc)
+
+        ParserEngine._decoded = (content, document)
+        return document
+
+    def match(self, path):
+        """ Select values from structured content with a path expression
+
+        :args path: the path expression, see the module documentation
+
+        :returns: list of the selected values when the path has a wildcard
+            or a filter, else the selected value or None when not found
+        """
+        try:
+            steps = compile_path(path)
+        except PathSyntaxError as exc:
+            raise AnsibleError(str(exc))
+
+        value = evaluate(steps, self.document())
+        return None if value is _MISSING else value
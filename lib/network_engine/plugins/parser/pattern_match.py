@@ -9,46 +9,136 @@ __metaclass__ = type
 
 import re
 
-from ansible.module_utils.six import iteritems
+from ansible.module_utils.six import iteritems, string_types
+from ansible.module_utils._text import to_bytes, to_text
+from ansible.errors import AnsibleError
+
+try:
+    import ipaddress
+except ImportError:
+    from ansible.module_utils.compat import ipaddress
+
+from network_engine.content import ContentView
+from network_engine.regex_backend import compile_regex, required_literal
 
 
 def get_value(m, i):
     return m.group(i) if m else None
 
 
+BOOLEAN_TRUE = frozenset(('true', 'yes', 'on', 'enabled', 'up', '1'))
+BOOLEAN_FALSE = frozenset(('false', 'no', 'off', 'disabled', 'down', '0'))
+
+MAC_SEPARATORS_RE = re.compile(r'[.:-]')
+MAC_RE = re.compile(r'^[0-9a-f]{12}$')
+
+
+def to_bool(value):
+    value = value.strip().lower()
+    if value in BOOLEAN_TRUE:
+        return True
+    elif value in BOOLEAN_FALSE:
+        return False
+    raise ValueError('not a boolean')
+
+
+def to_mac(value):
+    """ Return the MAC address in lower case colon separated notation
+    """
+    digits = MAC_SEPARATORS_RE.sub('', value.strip()).lower()
+    if not MAC_RE.match(digits):
+        raise ValueError('not a mac address')
+    return ':'.join(digits[i:i + 2] for i in range(0, 12, 2))
+
+
+def to_ip(value):
+    return to_text(ipaddress.ip_address(to_text(value.strip())))
+
+
+def to_prefix(value):
+    return to_text(ipaddress.ip_interface(to_text(value.strip())))
+
+
+CAPTURE_TYPES = {
+    'str': to_text,
+    'int': int,
+    'float': float,
+    'bool': to_bool,
+    'mac': to_mac,
+    'ip': to_ip,
+    'prefix': to_prefix
+}
+
+
 class ParserEngine(object):
 
-    def __init__(self, text):
+    def __init__(self, text, backend=None, watchdog=None):
         self.text = text
+        self.backend = backend
+        self.watchdog = watchdog
 
-    def match(self, regex, match_all=None, match_until=None, match_greedy=None):
+    def match(self, regex, match_all=None, match_until=None, match_greedy=None, types=None):
         """ Perform the regular expression match against the content
 
+        The content is either a string or a ContentView, which is scanned
+        in place with a bytes pattern.  The sections returned by
+        match_greedy for a ContentView are views of the same buffer.
+
         :args regex: The regular expression pattern to use
         :args content: The content to run the pattern against
         :args match_all: Specifies if all matches of pattern should be returned
             or just the first occurrence
+        :args types: hash of named group to one of the CAPTURE_TYPES the
+            captured value is converted to
 
         :returns: list object of matches or None if there where no matches found
         """
         content = self.text
 
         if match_greedy:
+            if match_all and not self._prefilter(regex, content):
+                return []
+            if isinstance(content, ContentView):
+                return self._match_greedy_view(content, regex, end=match_until, match_all=match_all)
             return self._match_greedy(content, regex, end=match_until, match_all=match_all)
         elif match_all:
-            return self._match_all(content, regex)
+            return self._match_all(content, regex, types)
         else:
-            return self._match(content, regex)
+            return self._match(content, regex, types)
 
-    def _match_all(self, content, pattern):
-        match = self.re_matchall(pattern, content)
+    def _match_all(self, content, pattern, types=None):
+        match = self.re_matchall(pattern, content, types)
         if match:
             return match
 
-    def _match(self, content, pattern):
-        match = self.re_search(pattern, content)
+    def _match(self, content, pattern, types=None):
+        match = self.re_search(pattern, content, types)
         return match
 
+    def _get_converters(self, regex, types):
+        """ Return a hash of named group to type name after validating types
+        """
+        converters = {}
+        for name, type_name in iteritems(types or {}):
+            if name not in regex.groupindex:
+                raise AnsibleError('type given for unknown group %s in regex %s' % (name, to_text(regex.pattern)))
+            if not isinstance(type_name, string_types) or type_name not in CAPTURE_TYPES:
+                raise AnsibleError('invalid type %s for group %s, expected one of %s'
+                                   % (type_name, name, ', '.join(sorted(CAPTURE_TYPES))))
+            converters[name] = type_name
+        return converters
+
+    def _convert(self, converters, name, value):
+        type_name = converters.get(name)
+        if type_name is None or value is None:
+            return value
+        if isinstance(value, string_types) and not value.strip():
+            return None
+        try:
+            return CAPTURE_TYPES[type_name](value)
+        except ValueError:
+            raise AnsibleError('unable to convert value %r of group %s to %s' % (value, name, type_name))
+
     def _match_greedy(self, content, start, end=None, match_all=None):
         """ Filter a section of the content text for matching
 
@@ -81,24 +171,57 @@ class ParserEngine(object):
 
         return section_data
 
+    def _match_greedy_view(self, content, start, end=None, match_all=None):
+        """ Return the sections of a ContentView as views of its buffer
+
+        Same as _match_greedy but the buffer is scanned from an offset
+        instead of slicing the remaining content for every section.
+        """
+        if not match_all:
+            return [content]
+
+        context_start_re = self._compile(start, content)
+        context_end_re = self._compile(end, content) if end else context_start_re
+
+        buffer, pos, endpos = content.buffer, content.start, content.end
+        section_data = list()
+
+        while True:
+            context_start = self._scan(context_start_re, context_start_re.search, buffer, pos, endpos)
+            if not context_start:
+                break
+
+            string_start = context_start.start()
+            after = min(context_start.end() + 1, endpos)
+
+            context_end = self._scan(context_end_re, context_end_re.search, buffer, after, endpos)
+            if not context_end:
+                section_data.append(ContentView(buffer, string_start, endpos))
+                break
+
+            pos = context_end.end() if end else context_end.start()
+            section_data.append(ContentView(buffer, string_start, pos))
+
+        return section_data
+
     def _get_section_range(self, content, start, end=None):
 
-        context_start_re = re.compile(start, re.M)
+        context_start_re = compile_regex(start, re.M, self.backend)
         if end:
-            context_end_re = re.compile(end, re.M)
+            context_end_re = compile_regex(end, re.M, self.backend)
             include_end = True
         else:
             context_end_re = context_start_re
             include_end = False
 
-        context_start = re.search(context_start_re, content)
+        context_start = self._scan(context_start_re, context_start_re.search, content)
         if not context_start:
             return
 
         string_start = context_start.start()
         end = context_start.end() + 1
 
-        context_end = re.search(context_end_re, content[end:])
+        context_end = self._scan(context_end_re, context_end_re.search, content[end:])
         if not context_end:
             return (string_start, None)
 
@@ -136,29 +259,86 @@ class ParserEngine(object):
 
         return context_data
 
-    def re_search(self, regex, value):
+    def _compile(self, regex, content):
+        """ Compile regex for content, as a bytes pattern for a ContentView
+        """
+        if isinstance(content, ContentView):
+            return compile_regex(to_bytes(regex, errors='surrogate_or_strict'), re.M, self.backend, buffers=True)
+        return compile_regex(regex, re.M, self.backend)
+
+    def _scan(self, regex, func, *args):
+        """ Run a scan of regex under the time budget of the watchdog
+        """
+        if self.watchdog is None:
+            return func(*args)
+        return self.watchdog.scan(to_text(regex.pattern, errors='surrogate_or_strict'), func, *args)
+
+    def _prefilter(self, regex, content):
+        """ Return False when content lacks a literal every match contains
+
+        The regex is not run on content that is rejected, the watchdog
+        counts the rejected scans.
+        """
+        literal = required_literal(regex)
+        if literal is None:
+            return True
+
+        if isinstance(content, ContentView):
+            found = content.buffer.find(literal[1], content.start, content.end) >= 0
+        else:
+            found = literal[0] in content
+
+        if not found and self.watchdog is not None:
+            self.watchdog.skip(regex, literal[0])
+        return found
+
+    def _scan_args(self, content):
+        if isinstance(content, ContentView):
+            return content.buffer, content.start, content.end
+        return content, 0, len(content)
+
+    def _decode(self, value):
+        if isinstance(value, bytes):
+            return to_text(value, errors='surrogate_or_strict')
+        return value
+
+    def re_search(self, regex, value, types=None):
         obj = {'matches': []}
-        regex = re.compile(regex, re.M)
-        match = regex.search(value)
+        mapped = isinstance(value, ContentView)
+        filtered = not self._prefilter(regex, value)
+        regex = self._compile(regex, value)
+        converters = self._get_converters(regex, types)
+        if filtered:
+            return obj
+        match = self._scan(regex, regex.search, *self._scan_args(value))
         if match:
             items = list(match.groups())
+            if mapped:
+                items = [self._decode(i) for i in items]
             if regex.groupindex:
                 for name, index in iteritems(regex.groupindex):
-                    obj[name] = items[index - 1]
+                    obj[name] = self._convert(converters, name, items[index - 1])
             obj['matches'] = items
         return obj
 
-    def re_matchall(self, regex, value):
+    def re_matchall(self, regex, value, types=None):
         objects = list()
-        regex = re.compile(regex)
-        for match in re.findall(regex.pattern, value, re.M):
+        mapped = isinstance(value, ContentView)
+        filtered = not self._prefilter(regex, value)
+        regex = self._compile(regex, value)
+        converters = self._get_converters(regex, types)
+        if filtered:
+            return objects
+        for match in self._scan(regex, regex.findall, *self._scan_args(value)):
+            if mapped:
+                match = tuple(self._decode(m) for m in match) if isinstance(match, tuple) else self._decode(match)
             obj = {}
             obj['matches'] = match
             if regex.groupindex:
                 for name, index in iteritems(regex.groupindex):
                     if len(regex.groupindex) == 1:
-                        obj[name] = match
+                        obj[name] = self._convert(converters, name, match)
                     else:
-                        obj[name] = match[index - 1]
+                        obj[name] = self._convert(converters, name, match[index - 1])
             objects.append(obj)
         return objects
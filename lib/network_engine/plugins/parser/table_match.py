@@ -0,0 +1,237 @@
+# (c) 2018, Ansible by Red Hat, inc
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import re
+
+from ansible.module_utils.six import iteritems, string_types
+from ansible.errors import AnsibleError
+
+from network_engine.content import ContentView
+from network_engine.regex_backend import compile_regex
+from network_engine.plugins.parser.pattern_match import CAPTURE_TYPES
+
+
+# characters of the lines that separate the header from the rows
+SKIP_CHARS = ' \t\r-=+*_|'
+FIRST_LINE_RE = re.compile(r'^[ \t]*\S.*$', re.M)
+EMPTY_LINE_RE = re.compile(r'\n[ \t\r]*(?:\n|$)')
+KEY_RE = re.compile(r'[^0-9a-z]+')
+
+_ROW_PATTERNS = {}
+
+
+def column_key(name):
+    """ Return the fact key for a column header, `IP-Address` is `ip_address`
+    """
+    return KEY_RE.sub('_', name.lower()).strip('_')
+
+
+def row_pattern(offsets):
+    """ Return the compiled pattern that slices a row at offsets
+
+    Every column but the last is captured by a lookahead and consumed by a
+    backreference, which makes the match atomic, and must end next to a
+    space or the end of the line.  A line with a value that crosses a
+    column boundary does not match.  The pattern always uses `re` because
+    of the backreferences.
+    """
+    key = tuple(offsets)
+    try:
+        return _ROW_PATTERNS[key]
+    except KeyError:
+        parts = ['^']
+        for index, (left, right) in enumerate(zip(offsets, offsets[1:])):
+            parts.append(r'(?=(.{0,%d}))\%d(?:(?<=\s)|(?=\s)|$)' % (right - left, index + 1))
+        parts.append('(.*)$')
+        pattern = _ROW_PATTERNS[key] = re.compile(''.join(parts), re.M)
+        return pattern
+
+
+class ParserEngine(object):
+
+    def __init__(self, text, backend=None):
+        self.text = text
+        self.backend = backend
+
+    def match(self, header=None, columns=None, match_until=None, wrapped=None, types=None):
+        """ Parse a table of fixed width columns
+
+        The column offsets are taken from the header line and the rows are
+        sliced at those offsets by a single pattern that is built from the
+        offsets and cannot backtrack, so there is no regular expression per
+        row.  A value that crosses a column boundary, because it is right
+        aligned or longer than its column, is kept whole.
+
+        :args header: regex that matches the header line, the first line
+            that is not empty when not set
+        :args columns: list of column names as they appear in the header,
+            required for names that contain a space.  Every word of the
+            header is a column when not set
+        :args match_until: regex that matches the first line after the
+            table, the first empty line when not set
+        :args wrapped: when True, a row that has no value in the first
+            column continues the row before it
+        :args types: hash of column key to one of the pattern_match
+            CAPTURE_TYPES the value is converted to
+
+        :returns: list of hash objects, one per row, keyed by column key
+        """
+        text = self.text
+        if isinstance(text, ContentView):
+            text = text.text
+        if '\t' in text:
+            text = text.expandtabs()
+
+        if header:
+            found = compile_regex('^.*(?:%s).*$' % header, re.M, self.backend).search(text)
+        else:
+            found = FIRST_LINE_RE.search(text)
+
+        if not found:
+            return list()
+
+        names, offsets = self._get_columns(found.group(0).rstrip('\r'), columns)
+        keys = [column_key(n) for n in names]
+
+        for key in (types or {}):
+            if key not in keys:
+                raise AnsibleError('type given for unknown column %s, expected one of %s' % (key, ', '.join(keys)))
+            if not isinstance(types[key], string_types) or types[key] not in CAPTURE_TYPES:
+                raise AnsibleError('invalid type %s for column %s, expected one of %s'
+                                   % (types[key], key, ', '.join(sorted(CAPTURE_TYPES))))
+
+        start = found.end() + 1
+        if match_until:
+            until = compile_regex(match_until, re.M, self.backend).search(text, start)
+            end = until.start() if until else len(text)
+        else:
+            until = EMPTY_LINE_RE.search(text, found.end())
+            end = until.start() + 1 if until else len(text)
+
+        table = text[start:max(start, end)]
+
+        strip = type(table).strip
+        rows = self._slice(table, offsets)
+
+        # blank and separator lines are dropped before the values are
+        # stripped, the first column rules out nearly every row
+        if not wrapped and not types:
+            return [dict(zip(keys, map(strip, row))) for row in rows
+                    if row[0].strip(SKIP_CHARS) or ''.join(row).strip(SKIP_CHARS)]
+
+        values_list = list()
+        for row in rows:
+            if not (row[0].strip(SKIP_CHARS) or ''.join(row).strip(SKIP_CHARS)):
+                continue
+            values = list(map(strip, row))
+            if wrapped and not values[0] and values_list:
+                previous = values_list[-1]
+                for index, value in enumerate(values):
+                    if value:
+                        previous[index] = ('%s %s' % (previous[index], value)).strip()
+                continue
+            values_list.append(values)
+
+        if types:
+            return [self._build(keys, values, types) for values in values_list]
+        return [dict(zip(keys, values)) for values in values_list]
+
+    def _slice(self, table, offsets):
+        """ Return the column values of every line, not stripped
+        """
+        pattern = row_pattern(offsets)
+
+        if table.endswith('\n'):
+            table = table[:-1]
+        if not table:
+            return list()
+
+        rows = pattern.findall(table)
+        if len(rows) == table.count('\n') + 1:
+            return rows
+
+        # some values cross a column boundary, the lines the pattern did not
+        # match are split one at a time
+        rows = list()
+        pos = 0
+        for match in pattern.finditer(table):
+            if match.start() > pos:
+                for line in table[pos:match.start()].splitlines():
+                    rows.append(self._split(line, offsets))
+            rows.append(match.groups())
+            pos = match.end() + 1
+        for line in table[pos:].splitlines():
+            rows.append(self._split(line, offsets))
+
+        return rows
+
+    def _get_columns(self, line, columns):
+        names = list()
+        offsets = list()
+
+        if columns:
+            pos = 0
+            for name in columns:
+                offset = line.find(name, pos)
+                if offset < 0:
+                    raise AnsibleError('column %s not found in header line %r' % (name, line))
+                names.append(name)
+                offsets.append(offset)
+                pos = offset + len(name)
+        else:
+            for match in re.finditer(r'\S+', line):
+                names.append(match.group())
+                offsets.append(match.start())
+
+        # the first column always starts at the beginning of the line
+        if offsets:
+            offsets[0] = 0
+
+        return names, offsets
+
+    def _split(self, line, offsets):
+        cuts = list()
+        last = len(line)
+        prev = 0
+
+        for offset in offsets[1:]:
+            cut = max(offset, prev)
+            if 0 < cut < last and line[cut - 1] != ' ' and line[cut] != ' ':
+                # the value crosses the boundary, it belongs to the column it
+                # starts in
+                left = line.rfind(' ', prev, cut) + 1
+                if left > prev:
+                    cut = left
+                else:
+                    right = line.find(' ', cut)
+                    cut = last if right < 0 else right
+            cuts.append(cut)
+            prev = cut
+
+        values = list()
+        prev = 0
+        for cut in cuts:
+            values.append(line[prev:cut].strip())
+            prev = cut
+        values.append(line[prev:].strip())
+
+        return values
+
+    def _build(self, keys, values, types):
+        obj = dict(zip(keys, values))
+        for key, type_name in iteritems(types):
+            value = obj.get(key)
+            if not value:
+                obj[key] = None
+                continue
+            try:
+                obj[key] = CAPTURE_TYPES[type_name](value)
+            except ValueError:
+                raise AnsibleError('unable to convert value %r of column %s to %s' % (value, key, type_name))
+        return obj
@@ -0,0 +1,222 @@
+# (c) 2018, Ansible by Red Hat, inc
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import re
+
+from xml.etree.ElementTree import XMLPullParser, ParseError
+
+from ansible.module_utils.six import iteritems, string_types
+from ansible.errors import AnsibleError
+
+from network_engine.content import ContentView
+from network_engine.plugins.parser.pattern_match import CAPTURE_TYPES
+
+
+CHUNK_SIZE = 65536
+
+XML_START_RE = re.compile(r'\s*<')
+SEGMENT_RE = re.compile(r'^(?:\*|[^\s/@\[\]]+)$')
+
+
+def is_xml(text):
+    """ Return True if the text starts with markup, leading space aside
+    """
+    return isinstance(text, string_types) and XML_START_RE.match(text) is not None
+
+
+def local_name(tag):
+    """ Return the tag or attribute name without its namespace
+    """
+    return tag.rsplit('}', 1)[-1] if tag[:1] == '{' else tag
+
+
+def compile_path(path):
+    """ Return the (anchored, segments) of an element path
+
+    :raises ValueError: when the path is not valid
+    """
+    if not isinstance(path, string_types) or not path.strip('/ '):
+        raise ValueError('path must be a non empty string')
+    anchored = path.startswith('/') and not path.startswith('//')
+    segments = path.strip('/').split('/')
+    for segment in segments:
+        if not SEGMENT_RE.match(segment):
+            raise ValueError('invalid path segment %r in %s' % (segment, path))
+    return anchored, segments
+
+
+def compile_field(field):
+    """ Return the (element path, attribute) of a field path
+
+    :raises ValueError: when the field path is not valid
+    """
+    if not isinstance(field, string_types) or not field.strip():
+        raise ValueError('field path must be a non empty string')
+    path, sep, attribute = field.partition('@')
+    path = path.rstrip('/') or '.'
+    if '@' in attribute or (sep and not attribute):
+        raise ValueError('invalid attribute in field path %s' % field)
+    if path != '.':
+        for segment in path.split('/'):
+            if segment != '.' and not SEGMENT_RE.match(segment):
+                raise ValueError('invalid segment %r in field path %s' % (segment, field))
+    return path, attribute or None
+
+
+def _chunks(content):
+    """ Yield the content from its first markup character in chunks
+    """
+    if isinstance(content, ContentView):
+        buffer, end = content.buffer, content.end
+        start = buffer.find(b'<', content.start, end)
+        if start < 0:
+            start = end
+        for offset in range(start, end, CHUNK_SIZE):
+            yield buffer[offset:min(offset + CHUNK_SIZE, end)]
+    else:
+        match = XML_START_RE.match(content)
+        start = match.end() - 1 if match else 0
+        for offset in range(start, len(content), CHUNK_SIZE):
+            yield content[offset:offset + CHUNK_SIZE]
+
+
+class ParserEngine(object):
+
+    def __init__(self, content):
+        self.content = content
+
+    def match(self, path, fields=None, types=None):
+        """ Select elements from XML content in one streaming pass
+
+        The content is parsed incrementally.  Namespaces are removed from
+        the tag and attribute names of the selected elements, and every
+        element is dropped from the tree once it is complete, so memory is
+        bounded by the largest selected element and not by the size of the
+        document.
+
+        :args path: the element names separated by `/`, matched against
+            the end of the path of every element, `*` matches any name and
+            a leading `/` anchors the path at the root element.  Elements
+            inside a selected element are not selected again.
+        :args fields: hash of key to field path relative to the selected
+            element, such as `name`, `traffic-statistics/input-packets`,
+            `@style` or `mtu/@format`.  The text of the field, without
+            surrounding space, is set to the key or None when the field is
+            not found.
+        :args types: hash of field key to one of the pattern_match
+            CAPTURE_TYPES the value is converted to
+
+        :returns: list of one hash of fields per selected element, or of
+            the text of the selected elements when fields is not set
+        """
+        if not isinstance(self.content, (string_types, ContentView)):
+            raise AnsibleError('xml_select requires XML text content, got %s' % type(self.content).__name__)
+
+        try:
+            anchored, segments = compile_path(path)
+            compiled = [(key, compile_field(field)) for key, field in iteritems(fields or {})]
+        except ValueError as exc:
+            raise AnsibleError(str(exc))
+
+        for key, type_name in iteritems(types or {}):
+            if fields and key not in fields:
+                raise AnsibleError('type given for unknown field %s, expected one of %s' % (key, ', '.join(sorted(fields))))
+            if not isinstance(type_name, string_types) or type_name not in CAPTURE_TYPES:
+                raise AnsibleError('invalid type %s for field %s, expected one of %s'
+                                   % (type_name, key, ', '.join(sorted(CAPTURE_TYPES))))
+
+        results = list()
+        stack = list()
+        names = list()
+        local_names = {}
+        last = segments[-1]
+        selected = None
+        closed = False
+
+        parser = XMLPullParser(events=('start', 'end'))
+        try:
+            for chunk in _chunks(self.content):
+                parser.feed(chunk)
+                for event, elem in parser.read_events():
+                    if event == 'start':
+                        tag = elem.tag
+                        name = local_names.get(tag)
+                        if name is None:
+                            name = local_names[tag] = local_name(tag)
+                        stack.append(elem)
+                        names.append(name)
+                        if selected is None:
+                            if last != name and last != '*' or not self._selects(names, anchored, segments):
+                                continue
+                            selected = len(stack)
+                        elem.tag = name
+                        if elem.attrib:
+                            elem.attrib = dict((local_name(k), v) for k, v in iteritems(elem.attrib))
+                        continue
+
+                    depth = len(stack)
+                    stack.pop()
+                    names.pop()
+                    if selected is not None:
+                        if selected != depth:
+                            continue
+                        results.append(self._extract(elem, compiled, types))
+                        selected = None
+
+                    # drop the complete element, the children of its parent
+                    # are dropped as they complete so it is the only one
+                    if stack:
+                        del stack[-1][:]
+                    else:
+                        closed = True
+
+                if closed:
+                    break
+            if not closed:
+                parser.close()
+        except ParseError as exc:
+            # text after the root element, such as a prompt, is ignored
+            if not closed:
+                raise AnsibleError('unable to parse the content as XML: %s' % exc)
+
+        return results
+
+    def _selects(self, names, anchored, segments):
+        if len(names) < len(segments) or (anchored and len(names) != len(segments)):
+            return False
+        for name, segment in zip(names[-len(segments):], segments):
+            if segment != '*' and segment != name:
+                return False
+        return True
+
+    def _extract(self, elem, fields, types):
+        if not fields:
+            return (elem.text or '').strip()
+
+        row = dict()
+        for key, (path, attribute) in fields:
+            node = elem if path == '.' else elem.find(path)
+            if node is None:
+                value = None
+            elif attribute:
+                value = node.get(attribute)
+            else:
+                value = (node.text or '').strip()
+
+            type_name = (types or {}).get(key)
+            if type_name and value is not None:
+                if not value:
+                    value = None
+                else:
+                    try:
+                        value = CAPTURE_TYPES[type_name](value)
+                    except ValueError:
+                        raise AnsibleError('unable to convert value %r of field %s to %s' % (value, key, type_name))
+            row[key] = value
+        return row
@@ -8,10 +8,21 @@ from __future__ import (absolute_import, division, print_function)
 __metaclass__ = type
 
 import collections
+import re
 
-from ansible.module_utils.six import iteritems, string_types
+from ansible.module_utils.six import iteritems, integer_types, string_types
 from ansible.errors import AnsibleUndefinedVariable
 
+from network_engine.content import is_view
+
+
+# a template that only references a variable, such as "{{ item.mtu }}"
+VARIABLE_RE = re.compile(r'^{{\s*([A-Za-z_]\w*(?:\.\w+)*)\s*}}$')
+
+NATIVE_TYPES = (bool, float) + integer_types
+
+_MISSING = object()
+
 
 class TemplateBase(object):
 
@@ -38,6 +49,11 @@ class TemplateBase(object):
             return [self.template(i, variables, convert_bare=convert_bare) for i in data]
 
         else:
+            if isinstance(data, string_types):
+                value = self._lookup_native(data, variables)
+                if value is not _MISSING:
+                    return value
+
             data = data or {}
             tmp_avail_vars = self._templar._available_variables
             self._templar.set_available_variables(variables)
@@ -51,6 +67,39 @@ class TemplateBase(object):
                 self._templar.set_available_variables(tmp_avail_vars)
             return resp
 
+    def _lookup_native(self, data, variables):
+        """ Return the value of a variable only template if it is a number,
+        a boolean or mapped content
+
+        Values converted by the `types` argument of `pattern_match` are
+        returned as they are instead of being rendered to a string by the
+        templar and converted back, and so are ContentView objects so that
+        `content_file` sections are not decoded.  Anything else, including
+        references that cannot be resolved here, returns _MISSING and is
+        templated.
+        """
+        match = VARIABLE_RE.match(data)
+        if not match or not isinstance(variables, collections.Mapping):
+            return _MISSING
+
+        parts = match.group(1).split('.')
+        if parts[0] not in variables:
+            return _MISSING
+
+        value = variables[parts[0]]
+        for part in parts[1:]:
+            if isinstance(value, collections.Mapping) and part in value and not hasattr(value, part):
+                value = value[part]
+            elif isinstance(value, (list, tuple)) and part.isdigit() and int(part) < len(value):
+                value = value[int(part)]
+            else:
+                return _MISSING
+
+        if isinstance(value, NATIVE_TYPES) or is_view(value):
+            return value
+
+        return _MISSING
+
     def _coerce_to_native(self, value):
         if not isinstance(value, bool):
             try:
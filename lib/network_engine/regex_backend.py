@@ -0,0 +1,248 @@
+# (c) 2018, Ansible by Red Hat, inc
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Regular expression backends for the pattern_match engine
+
+The engine only needs `compile()` and a compiled pattern that provides
+`search()`, `findall()`, `groupindex` and `pattern` like the stdlib `re`
+module.  The backends are:
+
+* `re` - the stdlib module, always available and the default
+* `re2` - Google RE2 (the `google-re2` or `pyre2` package), which matches in
+  linear time but does not support backreferences or lookaround
+* `regex` - the `regex` package, a drop-in replacement for `re`
+
+A pattern that the selected backend cannot compile, or a backend that is
+not installed, falls back to `re`.
+
+required_literal() finds the longest literal text every match of a pattern
+contains, so the engine can reject content that does not contain it with
+a substring search instead of running the pattern.
+"""
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import re
+
+from ansible.module_utils._text import to_bytes
+
+try:
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:
+    import sre_parse
+    import sre_constants
+
+
+DEFAULT_BACKEND = 're'
+
+# inline flags understood by all backends
+INLINE_FLAGS = ((re.I, 'i'), (re.M, 'm'), (re.S, 's'))
+
+
+class RegexBackend(object):
+
+    name = None
+
+    # the compiled patterns can scan buffers such as mmap objects
+    buffers = True
+
+    def compile(self, pattern, flags=0):
+        raise NotImplementedError
+
+
+class ReBackend(RegexBackend):
+
+    name = 're'
+
+    def compile(self, pattern, flags=0):
+        return re.compile(pattern, flags)
+
+
+class RegexModuleBackend(RegexBackend):
+
+    name = 'regex'
+
+    def __init__(self):
+        import regex
+        self._regex = regex
+
+    def compile(self, pattern, flags=0):
+        return self._regex.compile(pattern, flags)
+
+
+class Re2Backend(RegexBackend):
+
+    name = 're2'
+    buffers = False
+
+    def __init__(self):
+        import re2
+        self._re2 = re2
+        self._options = None
+
+        # google-re2 logs every pattern it fails to compile to stderr
+        if hasattr(re2, 'Options'):
+            self._options = re2.Options()
+            self._options.log_errors = False
+
+    def compile(self, pattern, flags=0):
+        inline = ''.join(c for f, c in INLINE_FLAGS if flags & f)
+        if inline:
+            pattern = '(?%s)%s' % (inline, pattern)
+        if self._options is not None:
+            return self._re2.compile(pattern, self._options)
+        return self._re2.compile(pattern)
+
+
+BACKENDS = {
+    're': ReBackend,
+    're2': Re2Backend,
+    'regex': RegexModuleBackend
+}
+
+_backends = {}
+
+
+def get_backend(name=None):
+    """ Return the backend instance for name
+
+    :param name: one of the BACKENDS names, None for the default
+
+    :returns: the backend or None if it is not installed
+    """
+    name = name or DEFAULT_BACKEND
+    if name not in BACKENDS:
+        raise ValueError('invalid regex backend %s, expected one of %s' % (name, ', '.join(sorted(BACKENDS))))
+
+    try:
+        return _backends[name]
+    except KeyError:
+        try:
+            backend = BACKENDS[name]()
+        except ImportError:
+            backend = None
+        _backends[name] = backend
+        return backend
+
+
+_PATTERN_CACHE = {}
+_PATTERN_CACHE_SIZE = 1024
+
+
+def compile_regex(regex, flags=0, backend=None, buffers=False):
+    """ Compile the regex once per process and return the cached pattern
+
+    The pattern is compiled by the named backend and by `re` when the
+    backend is not installed or does not support the pattern, or when
+    buffers is True and the backend cannot scan buffer objects.
+    """
+    key = (regex, flags, backend, buffers)
+    try:
+        return _PATTERN_CACHE[key]
+    except KeyError:
+        pass
+
+    if len(_PATTERN_CACHE) >= _PATTERN_CACHE_SIZE:
+        _PATTERN_CACHE.clear()
+
+    pattern = None
+    engine = get_backend(backend)
+    if engine is not None and engine.name != DEFAULT_BACKEND and (engine.buffers or not buffers):
+        try:
+            pattern = engine.compile(regex, flags)
+        except Exception:
+            pattern = None
+
+    if pattern is None:
+        pattern = re.compile(regex, flags)
+
+    _PATTERN_CACHE[key] = pattern
+    return pattern
+
+
+# ------------------ required literals ------------------
+
+# shorter literals reject too little content to be worth the search
+MIN_LITERAL = 3
+
+REPEATS = tuple(op for op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT,
+                              getattr(sre_constants, 'POSSESSIVE_REPEAT', None)) if op is not None)
+ATOMIC_GROUP = getattr(sre_constants, 'ATOMIC_GROUP', None)
+
+
+def _pattern_flags(parsed):
+    state = getattr(parsed, 'state', None) or getattr(parsed, 'pattern', None)
+    return getattr(state, 'flags', 0)
+
+
+def _literal_runs(items, runs, current):
+    """ Add the runs of literal characters every match of items contains
+
+    :param items: the parsed items of a sequence
+    :param runs: list the completed runs are appended to
+    :param current: the characters of the run items continue
+
+    :returns: the characters of the run that is still open after items
+    """
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            current.append(av)
+            continue
+
+        if op is sre_constants.SUBPATTERN and not (av[1] & re.I if len(av) == 4 else False):
+            # a group is a part of the sequence, the run goes on through it
+            current = _literal_runs(av[-1], runs, current)
+            continue
+
+        if op is ATOMIC_GROUP:
+            current = _literal_runs(av, runs, current)
+            continue
+
+        runs.append(current)
+        current = []
+        if op in REPEATS and av[0] >= 1:
+            runs.append(_literal_runs(av[2], runs, []))
+        # any other item, an alternation, a class or an assertion, ends
+        # the run
+
+    return current
+
+
+_LITERALS = {}
+
+
+def required_literal(regex):
+    """ Return the longest literal every match of regex contains
+
+    :param regex: the pattern text
+
+    :returns: tuple of the literal as text and as UTF-8 bytes, or None when
+        the pattern has no literal of MIN_LITERAL characters, ignores case
+        or cannot be parsed
+    """
+    try:
+        return _LITERALS[regex]
+    except KeyError:
+        pass
+
+    literal = None
+    try:
+        parsed = sre_parse.parse(regex, re.M)
+        if not _pattern_flags(parsed) & re.I:
+            runs = list()
+            runs.append(_literal_runs(parsed, runs, []))
+            longest = max(runs, key=len)
+            if len(longest) >= MIN_LITERAL:
+                text = ''.join(chr(c) for c in longest)
+                literal = (text, to_bytes(text, errors='surrogate_or_strict'))
+    except Exception:
+        literal = None
+
+    if len(_LITERALS) >= _PATTERN_CACHE_SIZE:
+        _LITERALS.clear()
+    _LITERALS[regex] = literal
+    return literal
@@ -0,0 +1,97 @@
+# (c) 2018, Ansible by Red Hat, inc
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Split `show tech-support` captures into command sections
+
+A tech-support bundle is the output of many commands, each preceded by a
+delimiter line that names the command.  The delimiter differs per network
+operating system and is described by a profile, a regex with a `command`
+named group that matches the delimiter lines.  The capture is split in a
+single pass over the delimiters and every section is the text between its
+delimiter and the next one.
+"""
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import re
+
+from ansible.module_utils.six import string_types
+from ansible.module_utils._text import to_bytes, to_text
+
+from network_engine.content import ContentView
+from network_engine.regex_backend import compile_regex
+
+
+# ------------------ section profiles ------------------
+DASHES_PROFILE = r'^-{5,} (?P<command>\S.*?) -{5,}[ \t\r]*$'
+
+SECTION_PROFILES = {
+    'ios': DASHES_PROFILE,
+    'iosxr': DASHES_PROFILE,
+    'eos': DASHES_PROFILE,
+    # `show version`
+    'nxos': r'^`(?P<command>[^`\n]+)`[ \t\r]*$',
+    # user@router> show version | no-more
+    'junos': r'^\S+@[^>\s]+> (?P<command>\S.*?)[ \t\r]*$',
+}
+
+
+def section_regex(profile, network_os=None):
+    """ Return the delimiter regex of a section profile
+
+    :param profile: True for the profile of network_os, the name of one of
+        the SECTION_PROFILES or a regex with a `command` named group
+
+    :returns: the regex string
+    """
+    if profile is True:
+        profile = network_os
+
+    if profile in SECTION_PROFILES:
+        return SECTION_PROFILES[profile]
+
+    if isinstance(profile, string_types) and '(?P<command>' in profile:
+        return profile
+
+    raise ValueError('invalid section profile %s, expected one of %s or a regex with a command named group'
+                     % (profile, ', '.join(sorted(SECTION_PROFILES))))
+
+
+def split_sections(content, regex, backend=None):
+    """ Split the content at the delimiter lines matched by regex
+
+    Text before the first delimiter is ignored.  The sections of a
+    ContentView are views of the same buffer.
+
+    :param content: the capture, a string or a ContentView
+    :param regex: delimiter regex with a `command` named group
+    :param backend: name of the regex backend
+
+    :returns: list of (command, section) tuples in capture order
+    """
+    if isinstance(content, ContentView):
+        pattern = compile_regex(to_bytes(regex, errors='surrogate_or_strict'), re.M, backend, buffers=True)
+        buffer, pos, endpos = content.buffer, content.start, content.end
+    else:
+        pattern = compile_regex(regex, re.M, backend)
+        buffer, pos, endpos = content, 0, len(content)
+
+    if 'command' not in pattern.groupindex:
+        raise ValueError('section regex %s requires a command named group' % regex)
+
+    delimiters = [(m.start(), m.end(), m.group('command')) for m in pattern.finditer(buffer, pos, endpos)]
+
+    sections = list()
+    for index, (start, end, command) in enumerate(delimiters):
+        stop = delimiters[index + 1][0] if index + 1 < len(delimiters) else endpos
+        start = min(end + 1, stop)
+        if isinstance(content, ContentView):
+            section = ContentView(buffer, start, stop)
+        else:
+            section = content[start:stop]
+        sections.append((to_text(command, errors='surrogate_or_strict').strip(), section))
+
+    return sections
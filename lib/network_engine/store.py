@@ -0,0 +1,240 @@
+# (c) 2018, Ansible by Red Hat, inc
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Local persistent store for parsed facts
+
+The parsers write the facts of a task to an SQLite database on the
+controller when `network_engine_fact_store` is set.  Every record is keyed
+by host, parser and timestamp and keeps the facts as JSON.  The scalar
+values of the facts are also written as one row per path, such as
+`interface_facts.Gi0/0.mtu` or `vlans[0]`, so the fact_store lookup
+selects them by path or value through an index instead of loading the
+facts of every host.
+"""
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import collections
+import json
+import re
+import sqlite3
+import time
+
+from ansible.module_utils.six import iteritems, string_types
+from ansible.module_utils._text import to_text
+
+from network_engine.facts import join_path
+from network_engine.utils import to_list
+
+
+SCHEMA_VERSION = 1
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS records ('
+    ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+    ' host TEXT NOT NULL,'
+    ' parser TEXT NOT NULL,'
+    ' timestamp REAL NOT NULL,'
+    ' facts TEXT NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS records_host ON records (host, parser, id)',
+    'CREATE TABLE IF NOT EXISTS fact_values ('
+    ' record INTEGER NOT NULL,'
+    ' path TEXT NOT NULL,'
+    ' value TEXT,'
+    ' json TEXT NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS fact_values_path ON fact_values (path, value)',
+    'CREATE INDEX IF NOT EXISTS fact_values_value ON fact_values (value)',
+    'CREATE INDEX IF NOT EXISTS fact_values_record ON fact_values (record)',
+)
+
+# characters that are special in a GLOB pattern but literal in a path
+GLOB_ESCAPE_RE = re.compile(r'([\[\]?])')
+
+
+class FactStoreError(Exception):
+    pass
+
+
+def flatten(data, path=''):
+    """ Return the list of (path, value) of the scalar values in data
+    """
+    items = list()
+    stack = [(path, data)]
+    while stack:
+        path, value = stack.pop()
+        if isinstance(value, collections.Mapping):
+            stack.extend((join_path(path, k), v) for k, v in iteritems(value))
+        elif isinstance(value, (list, tuple)):
+            stack.extend((join_path(path, i), v) for i, v in enumerate(value))
+        else:
+            items.append((path, value))
+    return items
+
+
+def text_value(value):
+    """ Return the text a scalar value is stored and queried as
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return to_text(value)
+
+
+def _glob(pattern):
+    """ Return the GLOB pattern and the regex of a path pattern
+
+    `*` matches one path element and a pattern also matches the paths
+    below the element it matches.  The GLOB selects the candidates with the
+    index and the regex keeps the paths where `*` did not match a `.`.
+    """
+    glob = GLOB_ESCAPE_RE.sub(r'[\1]', pattern) + '*'
+    regex = '^%s(?:$|[.\\[])' % '[^.\\[]*'.join(re.escape(p) for p in pattern.split('*'))
+    return glob, re.compile(regex)
+
+
+class FactStore(object):
+    """ SQLite store of parsed facts
+
+    :param path: path of the database file, created if it does not exist
+    :param timeout: seconds to wait for another process that writes
+    """
+
+    def __init__(self, path, timeout=30):
+        self.path = path
+        try:
+            self._conn = sqlite3.connect(path, timeout=timeout)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            version = self._conn.execute('PRAGMA user_version').fetchone()[0]
+            if version not in (0, SCHEMA_VERSION):
+                raise FactStoreError('fact store %s has schema version %s, expected %s' % (path, version, SCHEMA_VERSION))
+            with self._conn:
+                for statement in SCHEMA:
+                    self._conn.execute(statement)
+                self._conn.execute('PRAGMA user_version=%d' % SCHEMA_VERSION)
+        except sqlite3.Error as exc:
+            raise FactStoreError('unable to open fact store %s: %s' % (path, exc))
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, host, parser, facts, keep=None):
+        """ Write a record of facts
+
+        :param host: the inventory hostname
+        :param parser: name of the parser that produced the facts
+        :param facts: hash of the facts
+        :param keep: number of records of the host and parser to keep,
+            all when not set
+
+        :returns: the id of the record
+        """
+        encoded = json.dumps(facts, sort_keys=True, default=to_text)
+        values = [(path, text_value(value), json.dumps(value, default=to_text)) for path, value in flatten(facts)]
+
+        try:
+            with self._conn:
+                cursor = self._conn.execute('INSERT INTO records (host, parser, timestamp, facts) VALUES (?, ?, ?, ?)',
+                                            (host, parser, time.time(), encoded))
+                record = cursor.lastrowid
+                self._conn.executemany('INSERT INTO fact_values (record, path, value, json) VALUES (%d, ?, ?, ?)' % record, values)
+
+                if keep:
+                    old = [row[0] for row in self._conn.execute(
+                        'SELECT id FROM records WHERE host = ? AND parser = ? ORDER BY id DESC LIMIT -1 OFFSET ?',
+                        (host, parser, int(keep)))]
+                    if old:
+                        marks = ', '.join('?' * len(old))
+                        self._conn.execute('DELETE FROM fact_values WHERE record IN (%s)' % marks, old)
+                        self._conn.execute('DELETE FROM records WHERE id IN (%s)' % marks, old)
+        except sqlite3.Error as exc:
+            raise FactStoreError('unable to write to fact store %s: %s' % (self.path, exc))
+
+        return record
+
+    def _where(self, hosts, parsers, latest):
+        clauses = list()
+        args = list()
+        if hosts:
+            clauses.append('r.host IN (%s)' % ', '.join('?' * len(hosts)))
+            args.extend(hosts)
+        if parsers:
+            clauses.append('r.parser IN (%s)' % ', '.join('?' * len(parsers)))
+            args.extend(parsers)
+        if latest:
+            clauses.append('r.id IN (SELECT MAX(id) FROM records GROUP BY host, parser)')
+        return clauses, args
+
+    def query(self, paths=None, host=None, parser=None, value=None, latest=True):
+        """ Query the store
+
+        Without paths and value the records are returned with their facts,
+        otherwise the matching values are returned one per row.
+
+        :param paths: list of path patterns, `*` matches one path element
+            and the values below a matched element are returned
+        :param host: host or list of hosts
+        :param parser: parser or list of parsers
+        :param value: only return the values equal to value
+        :param latest: only use the latest record of each host and parser
+
+        :returns: list of hash objects with the keys host, parser and
+            timestamp and either facts or path and value
+        """
+        clauses, args = self._where(to_list(host), to_list(parser), latest)
+        paths = to_list(paths)
+
+        try:
+            if not paths and value is None:
+                sql = 'SELECT r.host, r.parser, r.timestamp, r.facts FROM records r'
+                if clauses:
+                    sql += ' WHERE ' + ' AND '.join(clauses)
+                sql += ' ORDER BY r.host, r.parser, r.id'
+                return [{'host': h, 'parser': p, 'timestamp': t, 'facts': json.loads(f)}
+                        for h, p, t, f in self._conn.execute(sql, args)]
+
+            regexes = list()
+            if paths:
+                globs = list()
+                for pattern in paths:
+                    if not isinstance(pattern, string_types):
+                        raise FactStoreError('path must be a string, got %s' % type(pattern))
+                    glob, regex = _glob(pattern)
+                    globs.append(glob)
+                    regexes.append(regex)
+                clauses.append('(%s)' % ' OR '.join('v.path GLOB ?' for g in globs))
+                args.extend(globs)
+
+            if value is not None:
+                clauses.append('v.value = ?')
+                args.append(text_value(value))
+
+            sql = ('SELECT r.host, r.parser, r.timestamp, v.path, v.json FROM fact_values v'
+                   ' JOIN records r ON r.id = v.record WHERE %s'
+                   ' ORDER BY r.host, r.parser, r.id, v.path' % ' AND '.join(clauses))
+
+            rows = list()
+            for h, p, t, path, encoded in self._conn.execute(sql, args):
+                if regexes and not any(r.match(path) for r in regexes):
+                    continue
+                rows.append({'host': h, 'parser': p, 'timestamp': t, 'path': path, 'value': json.loads(encoded)})
+            return rows
+
+        except sqlite3.Error as exc:
+            raise FactStoreError('unable to query fact store %s: %s' % (self.path, exc))
+
+
+def write_facts(path, host, parser, facts, keep=None):
+    """ Write facts to the store at path and return the record id
+    """
+    with FactStore(path) as store:
+        return store.write(host, parser, facts, keep)
@@ -0,0 +1,173 @@
+# (c) 2018, Ansible by Red Hat, inc
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Command to template index for textfsm_parser templates
+
+TextFSM template collections such as ntc-templates keep an `index` file
+next to the templates that maps the platform and the command to the
+template, in the format read by `textfsm.clitable`::
+
+    Template, Hostname, Platform, Command
+
+    cisco_ios_show_version.textfsm, .*, cisco_ios, sh[[ow]] ver[[sion]]
+
+The Hostname, Platform and Command columns are regexes matched from the
+start of the value.  In the Command column `[[...]]` marks the characters
+that may be left out of an abbreviated command, `sh[[ow]]` matches `sh`,
+`sho` and `show`.  The first row that matches is used.
+
+The index is parsed once per process and parsed again only when the index
+file changes.
+"""
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+import re
+
+from ansible.module_utils._text import to_bytes, to_text
+
+
+INDEX_FILENAME = 'index'
+
+COMPLETION_RE = re.compile(r'\[\[(.+?)\]\]')
+
+
+class TemplateIndexError(Exception):
+    pass
+
+
+def _completion(match):
+    """ Return the regex of an optional completion, sh[[ow]] is sh(o(w)?)?
+    """
+    chars = match.group(1)
+    return ''.join('(?:%s' % re.escape(c) for c in chars) + ')?' * len(chars)
+
+
+def normalize_command(command):
+    """ Return the command without output modifiers and extra whitespace
+    """
+    command = to_text(command, errors='surrogate_or_strict').split('|')[0]
+    return ' '.join(command.split())
+
+
+class TemplateIndex(object):
+    """ Index of the TextFSM templates in a directory
+
+    :param path: the directory of the index file and the templates
+    :param rows: list of (template, hostname, platform, command) tuples,
+        the last three are compiled regexes or None
+    :param stamp: the stat values of the index file
+    """
+
+    def __init__(self, path, rows=None, stamp=None):
+        self.path = path
+        self.rows = rows or list()
+        self.stamp = stamp
+
+    @classmethod
+    def load(cls, path):
+        """ Parse the index file in path
+
+        :returns: instance of TemplateIndex or None if path has no index
+        """
+        filename = os.path.join(path, INDEX_FILENAME)
+        try:
+            stat = os.stat(filename)
+            with open(to_bytes(filename, errors='surrogate_or_strict'), 'rb') as f:
+                lines = to_text(f.read(), errors='surrogate_or_strict').splitlines()
+        except (IOError, OSError):
+            return None
+
+        header = None
+        rows = list()
+
+        for lineno, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+
+            values = [v.strip() for v in line.split(',')]
+            if header is None:
+                header = values
+                for column in ('Template', 'Command'):
+                    if column not in header:
+                        raise TemplateIndexError('%s: missing %s column in the header' % (filename, column))
+                continue
+
+            if len(values) != len(header):
+                raise TemplateIndexError('%s:%d: expected %d columns, got %d' % (filename, lineno, len(header), len(values)))
+
+            row = dict(zip(header, values))
+            try:
+                rows.append((
+                    row['Template'],
+                    re.compile(row['Hostname']) if row.get('Hostname') else None,
+                    re.compile(row['Platform']) if row.get('Platform') else None,
+                    re.compile(COMPLETION_RE.sub(_completion, row['Command']), re.I)
+                ))
+            except re.error as exc:
+                raise TemplateIndexError('%s:%d: invalid regex: %s' % (filename, lineno, exc))
+
+        return cls(path, rows, [stat.st_mtime, stat.st_size])
+
+    def is_current(self):
+        """ Return True if the index file did not change since it was parsed
+        """
+        try:
+            stat = os.stat(os.path.join(self.path, INDEX_FILENAME))
+        except OSError:
+            return False
+        return [stat.st_mtime, stat.st_size] == self.stamp
+
+    def match(self, command, platform=None, hostname=None):
+        """ Return the path of the template for command
+
+        :param command: the command the output was produced by
+        :param platform: the platform of the device, matched against the
+            Platform column
+        :param hostname: the name of the device, matched against the
+            Hostname column
+
+        :returns: the absolute path of the template or None if no row
+            matches
+        """
+        command = normalize_command(command)
+        if not command:
+            return None
+
+        for template, hostname_re, platform_re, command_re in self.rows:
+            if hostname_re and not hostname_re.match(hostname or ''):
+                continue
+            if platform_re and not platform_re.match(platform or ''):
+                continue
+            if not command_re.match(command):
+                continue
+
+            if ':' in template:
+                raise TemplateIndexError('template %s of command `%s` lists several templates, which is not supported'
+                                         % (template, command))
+            return os.path.join(self.path, template)
+
+        return None
+
+
+_indexes = {}
+
+
+def get_template_index(path):
+    """ Return the up to date index of the templates in path
+
+    :returns: instance of TemplateIndex or None if path has no index file
+    """
+    path = os.path.abspath(path)
+
+    index = _indexes.get(path)
+    if index is None or not index.is_current():
+        index = TemplateIndex.load(path)
+        _indexes[path] = index
+
+    return index
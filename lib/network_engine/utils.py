@@ -7,7 +7,26 @@
 from itertools import chain
 
 from ansible.module_utils.six import iteritems
-from ansible.module_utils.network.common.utils import sort_list
+
+
+# to_list() and sort_list() behave like the helpers of the same name in
+# ansible.module_utils.network.common.utils.  They are defined here so the
+# plugins do not import that module, which pulls in module_utils.basic and
+# adds a noticeable fixed cost to every task.
+
+def to_list(val):
+    if isinstance(val, (list, tuple, set)):
+        return list(val)
+    elif val is not None:
+        return [val]
+    else:
+        return list()
+
+
+def sort_list(val):
+    if isinstance(val, list):
+        return sorted(val)
+    return val
 
 
 def dict_merge(base, other):
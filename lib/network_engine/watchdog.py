@@ -0,0 +1,343 @@
+# (c) 2018, Ansible by Red Hat, inc
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Time budgets and backtracking checks for pattern_match regexes
+
+A Watchdog runs every scan of the pattern_match engine under a time budget
+per pattern and a budget for the whole parse.  In the main thread the scan
+is interrupted by SIGALRM when the budget runs out, the `re` module checks
+for signals while it backtracks.  Elsewhere the elapsed time is checked
+once the scan returns.  The scan time and the number of matches of every
+pattern are collected for the task result, with the number of scans the
+required literal prefilter of the engine skipped.
+
+backtracking_risks() inspects the parsed form of a regex for the shapes
+that backtrack exponentially: an unbounded quantifier over a body that
+ends with another unbounded quantifier matching the same characters, such
+as `(a+)+` or `(\\d+\\s?)+`, and an unbounded quantifier over alternatives
+that can start with the same character.
+"""
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import signal
+import threading
+import time
+
+from ansible.module_utils.six import string_types
+
+try:
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:
+    import sre_parse
+    import sre_constants
+
+
+TIMEOUT_POLICIES = ('fail', 'skip', 'partial')
+
+
+class RegexTimeout(Exception):
+
+    def __init__(self, regex, elapsed, budget):
+        self.regex = regex
+        self.elapsed = elapsed
+        self.budget = budget
+        super(RegexTimeout, self).__init__('regex %r exceeded its time budget of %ss after %.3fs' % (regex, budget, elapsed))
+
+
+class _Alarm(Exception):
+    pass
+
+
+def _alarm(signum, frame):
+    raise _Alarm()
+
+
+class Watchdog(object):
+    """ Time budgets and statistics of regex scans
+
+    :param pattern_budget: seconds a single scan may take, no limit when
+        not set
+    :param parse_budget: seconds all the scans of a parse may take, no
+        limit when not set
+    """
+
+    def __init__(self, pattern_budget=None, parse_budget=None):
+        self.pattern_budget = pattern_budget
+        self.parse_budget = parse_budget
+        self.stats = {}
+        self._spent = 0.0
+
+    def start(self):
+        """ Start the budget of a new parse
+        """
+        self._spent = 0.0
+
+    def budget(self):
+        """ Return the seconds the next scan may take or None
+        """
+        budget = self.pattern_budget
+        if self.parse_budget is not None:
+            left = self.parse_budget - self._spent
+            budget = left if budget is None else min(budget, left)
+        return budget
+
+    def scan(self, regex, func, *args):
+        """ Call func(*args) under the budget and record its statistics
+
+        :param regex: the pattern text the statistics are kept for
+        :param func: the scan, such as the search method of a pattern
+
+        :returns: the return value of func
+        """
+        budget = self.budget()
+        if budget is not None and budget <= 0:
+            raise RegexTimeout(regex, 0.0, budget)
+
+        armed = budget is not None and hasattr(signal, 'setitimer') and isinstance(threading.current_thread(), threading._MainThread)
+        if armed:
+            previous = signal.signal(signal.SIGALRM, _alarm)
+            timer = signal.setitimer(signal.ITIMER_REAL, budget)
+
+        timed_out = False
+        start = time.time()
+        try:
+            result = func(*args)
+        except _Alarm:
+            timed_out = True
+        finally:
+            elapsed = time.time() - start
+            if armed:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+                signal.signal(signal.SIGALRM, previous)
+                # re-arm a timer that was running before the scan
+                if timer[0]:
+                    signal.setitimer(signal.ITIMER_REAL, max(timer[0] - elapsed, 0.001), timer[1])
+            self._spent += elapsed
+
+        stats = self.stats.setdefault(regex, [0, 0, 0.0, 0, None])
+        stats[0] += 1
+        stats[2] += elapsed
+
+        if timed_out or (budget is not None and elapsed > budget):
+            raise RegexTimeout(regex, elapsed, budget)
+
+        if isinstance(result, list):
+            stats[1] += len(result)
+        elif result is not None:
+            stats[1] += 1
+        return result
+
+    def skip(self, regex, literal):
+        """ Record a scan of regex skipped because the content lacks literal
+        """
+        stats = self.stats.setdefault(regex, [0, 0, 0.0, 0, None])
+        stats[3] += 1
+        stats[4] = literal
+
+    def report(self):
+        """ Return the statistics of every pattern, slowest first
+
+        `skipped` is the number of scans the prefilter rejected without
+        running the pattern and `skip_rate` their share of all the scans.
+        """
+        rows = list()
+        for regex, (scans, matches, seconds, skipped, literal) in self.stats.items():
+            row = {'regex': regex, 'scans': scans, 'matches': matches, 'time': round(seconds, 6),
+                   'skipped': skipped, 'skip_rate': round(float(skipped) / (scans + skipped), 4)}
+            if literal is not None:
+                row['literal'] = literal
+            rows.append(row)
+        return sorted(rows, key=lambda r: (-r['time'], r['regex']))
+
+
+# ------------------ static backtracking checks ------------------
+
+# code points 0-127 and 128 for any other character
+ALPHABET = frozenset(range(129))
+
+CATEGORIES = {
+    sre_constants.CATEGORY_DIGIT: frozenset(c for c in range(128) if chr(c).isdigit()),
+    sre_constants.CATEGORY_SPACE: frozenset(ord(c) for c in ' \t\n\r\f\v'),
+    sre_constants.CATEGORY_WORD: frozenset(c for c in range(128) if chr(c).isalnum() or chr(c) == '_') | frozenset([128]),
+    sre_constants.CATEGORY_LINEBREAK: frozenset([10]),
+}
+for _name, _category in (('NOT_DIGIT', 'DIGIT'), ('NOT_SPACE', 'SPACE'), ('NOT_WORD', 'WORD'), ('NOT_LINEBREAK', 'LINEBREAK')):
+    CATEGORIES[getattr(sre_constants, 'CATEGORY_%s' % _name)] = ALPHABET - CATEGORIES[getattr(sre_constants, 'CATEGORY_%s' % _category)]
+
+REPEATS = (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT)
+# possessive quantifiers and atomic groups do not backtrack, python 3.11+
+POSSESSIVE_REPEAT = getattr(sre_constants, 'POSSESSIVE_REPEAT', None)
+ATOMIC_GROUP = getattr(sre_constants, 'ATOMIC_GROUP', None)
+ZERO_WIDTH = (sre_constants.AT, sre_constants.ASSERT, sre_constants.ASSERT_NOT)
+
+
+def _char(code):
+    return code if code < 128 else 128
+
+
+def _in_set(items):
+    chars = set()
+    negate = False
+    for op, av in items:
+        if op is sre_constants.NEGATE:
+            negate = True
+        elif op is sre_constants.LITERAL:
+            chars.add(_char(av))
+        elif op is sre_constants.RANGE:
+            chars.update(range(min(av[0], 128), min(av[1], 127) + 1))
+            if av[1] >= 128:
+                chars.add(128)
+        elif op is sre_constants.CATEGORY:
+            chars.update(CATEGORIES.get(av, ALPHABET))
+        else:
+            return ALPHABET
+    return ALPHABET - chars if negate else frozenset(chars)
+
+
+def _first(items):
+    """ Return the characters items can start with and if they can be empty
+    """
+    chars = set()
+    for item in items:
+        first, nullable = _first_item(*item)
+        chars.update(first)
+        if not nullable:
+            return chars, False
+    return chars, True
+
+
+def _first_item(op, av):
+    if op is sre_constants.LITERAL:
+        return set([_char(av)]), False
+    elif op is sre_constants.NOT_LITERAL:
+        return ALPHABET - set([_char(av)]), False
+    elif op is sre_constants.ANY:
+        return ALPHABET - set([10]), False
+    elif op is sre_constants.IN:
+        return _in_set(av), False
+    elif op in REPEATS or op is POSSESSIVE_REPEAT:
+        first, nullable = _first(av[2])
+        return first, nullable or av[0] == 0
+    elif op is sre_constants.SUBPATTERN:
+        return _first(av[-1])
+    elif op is ATOMIC_GROUP:
+        return _first(av)
+    elif op is sre_constants.BRANCH:
+        chars = set()
+        nullable = False
+        for branch in av[1]:
+            first, empty = _first(branch)
+            chars.update(first)
+            nullable = nullable or empty
+        return chars, nullable
+    elif op in ZERO_WIDTH:
+        return set(), True
+    return set(ALPHABET), True
+
+
+def _tail_repeats(items):
+    """ Return the unbounded repeats that can end items
+    """
+    repeats = list()
+    for op, av in reversed(list(items)):
+        if op in REPEATS and av[1] == sre_constants.MAXREPEAT:
+            repeats.append(av)
+        elif op is sre_constants.SUBPATTERN:
+            repeats.extend(_tail_repeats(av[-1]))
+        elif op is sre_constants.BRANCH:
+            for branch in av[1]:
+                repeats.extend(_tail_repeats(branch))
+        if not _first_item(op, av)[1]:
+            break
+    return repeats
+
+
+def _branches(items):
+    items = list(items)
+    while len(items) == 1 and items[0][0] is sre_constants.SUBPATTERN:
+        items = list(items[0][1][-1])
+    if len(items) == 1 and items[0][0] is sre_constants.BRANCH:
+        return items[0][1][1]
+    return []
+
+
+def _walk(items, risks):
+    for op, av in items:
+        if op is POSSESSIVE_REPEAT or op is ATOMIC_GROUP:
+            continue
+
+        if op in REPEATS:
+            body = av[2]
+            if av[1] == sre_constants.MAXREPEAT:
+                first = _first(body)[0]
+                for inner in _tail_repeats(body):
+                    if first & _first(inner[2])[0]:
+                        risks.add('has nested unbounded quantifiers that match the same characters')
+                        break
+
+                branches = [_first(branch)[0] for branch in _branches(body)]
+                for index, chars in enumerate(branches):
+                    if any(chars & other for other in branches[index + 1:]):
+                        risks.add('repeats alternatives that can match the same characters')
+                        break
+            _walk(body, risks)
+        elif op is sre_constants.SUBPATTERN:
+            _walk(av[-1], risks)
+        elif op is sre_constants.BRANCH:
+            for branch in av[1]:
+                _walk(branch, risks)
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            _walk(av[1], risks)
+
+
+_risks = {}
+
+
+def backtracking_risks(regex):
+    """ Return the reasons regex is prone to catastrophic backtracking
+
+    :param regex: the pattern text
+
+    :returns: sorted list of reasons, empty when none were found or the
+        pattern cannot be parsed
+    """
+    try:
+        return _risks[regex]
+    except KeyError:
+        pass
+
+    risks = set()
+    try:
+        _walk(sre_parse.parse(regex), risks)
+    except Exception:
+        pass
+
+    _risks[regex] = sorted(risks)
+    return _risks[regex]
+
+
+def parser_regexes(tasks):
+    """ Return the (directive name, regex) of the literal pattern_match
+    regexes of the directives of a parser
+    """
+    regexes = list()
+    stack = list(reversed(tasks)) if isinstance(tasks, list) else []
+    while stack:
+        task = stack.pop()
+        if not isinstance(task, dict):
+            continue
+        for key in ('pattern_group', 'block'):
+            if isinstance(task.get(key), list):
+                stack.extend(reversed(task[key]))
+        args = task.get('pattern_match')
+        if isinstance(args, dict):
+            for key in ('regex', 'match_until'):
+                regex = args.get(key)
+                if isinstance(regex, string_types) and '{{' not in regex and '{%' not in regex:
+                    regexes.append((task.get('name'), regex))
+    return regexes
@@ -38,11 +38,57 @@ options:
         Default path is {{ playbook_dir }}/parser_templates/{{ ansible_network_os }}
         or {{ playbook_dir }}/parser_templates or {{ playbook_dir }}
     default: "{{ playbook_dir }}/parser_templates/{{ ansible_network_os }}"
+  command:
+    description:
+      - The command that produced C(content).  When set, only the parser
+        whose C(parser_metadata) C(command) matches is used, selected from
+        C(dir) or from the C(parser_templates) directories in the search
+        path.  Commands are compared without case, extra whitespace or
+        output modifiers and may be abbreviated, for instance
+        C(sh ip int br).  The index of the parsers is saved to
+        C(.parser_index) in the searched directory and is rebuilt when a
+        parser changes.  This argument is mutually exclusive with C(file).
+    default: null
+  sections:
+    description:
+      - Split C(content) or C(content_file), a C(show tech-support)
+        capture, into the output of each command at the delimiter lines of
+        a vendor profile and parse every section with the parser selected
+        for its command, as for C(command).  Set to C(yes) for the profile
+        of C(ansible_network_os), to one of the profile names or to a regex
+        with a C(command) named group that matches the delimiter lines.
+        Sections without a parser are skipped.  This argument is mutually
+        exclusive with C(file) and C(command).
+    default: null
+  delta:
+    description:
+      - Return only the facts that changed.  Every exported fact is
+        compared with the current fact of the same name of the host by a
+        structural hash and facts that did not change are left out of
+        C(ansible_facts), which keeps them as they are on the host.  A
+        fact that changed is returned whole and the C(delta) key of the
+        result lists the changed and unchanged facts and the paths that
+        were added, removed or changed inside them.
+    type: bool
+    default: false
   content:
     description:
       - The text content to pass to the parser engine.  This argument provides
-        the input to the text parser for generating the JSON data.
-    required: true
+        the input to the text parser for generating the JSON data.  One of
+        C(content) or C(content_file) is required.
+      - Structured content, such as the C(json) return value of C(cli) for
+        a command run with C(| json), is passed to the C(json_select)
+        directive as it is.  XML text is streamed by the C(xml_select)
+        directive.
+  content_file:
+    description:
+      - The path to a file on the Ansible controller that contains the text
+        to parse.  The file is memory mapped and scanned in place instead of
+        being loaded into a string, and the sections returned by
+        C(match_greedy) are offsets into the file, which keeps the memory
+        used by large captures such as C(show tech-support) low.  This
+        argument is mutually exclusive with C(content).
+    default: null
 author:
   - Ansible Network Team
 '''
@@ -51,4 +97,17 @@ EXAMPLES = '''
 - command_parser:
     file: files/parser_templates/show_interface.yaml
     content: "{{ lookup('file', 'output/show_interfaces.txt') }}"
+
+- command_parser:
+    file: files/parser_templates/show_interface.yaml
+    content_file: output/show_tech_support.txt
+
+- command_parser:
+    dir: files/parser_templates/ios
+    sections: yes
+    content_file: output/show_tech_support.txt
+
+- command_parser:
+    command: sh int
+    content: "{{ lookup('file', 'output/show_interfaces.txt') }}"
 '''
@@ -38,6 +38,26 @@ options:
         parser file.  This argument allow the TextFSM parser to be loaded
         from an external source.  See EXAMPLES.
     default: null
+  command:
+    description:
+      - The command that produced the content.  The template is selected
+        from the C(index) file of the template directories by the
+        platform, the hostname and the command, in the format of
+        C(textfsm.clitable) and ntc-templates.  Abbreviated commands are
+        matched when the index marks the optional characters with
+        C([[...]]), such as C(sh[[ow]] ver[[sion]]).
+      - The platform is the value of C(network_engine_textfsm_platform)
+        or else C(ansible_network_os).
+      - This argument is mutually exclusive with C(file) and C(src).
+    default: null
+    version_added: "2.6"
+  dir:
+    description:
+      - The directories that contain the C(index) file used to select the
+        template for C(command).  Defaults to the C(parser_templates)
+        directories in the search path.
+    default: null
+    version_added: "2.6"
   content:
     description:
       - The output of the command to parse using the rules in the TextFSM
@@ -49,6 +69,19 @@ options:
         hold the output of the parser.  If this argument is not provided,
         the output from parsing will not be exported.
     default: null
+  output:
+    description:
+      - The structure of the exported fact.  With C(list) the fact is a list
+        of one dict per parsed row.  With C(dict) the fact is a dict of the
+        rows keyed by the values the template flags with C(Key), so a row is
+        found without searching the list.  Several C(Key) values give nested
+        dicts, in the order the values are defined in the template.  Rows
+        with the same key fail the task.
+    default: list
+    choices:
+      - list
+      - dict
+    version_added: "2.6"
 '''
 
 EXAMPLES = '''
@@ -67,4 +100,20 @@ EXAMPLES = '''
   textfsm_parser:
     src: "{{ lookup('url', 'http://server/path/to/parser') }}"
     content: "{{ lookup('file', 'output/show_interfaces.txt') }}"
+
+- name: export the interfaces keyed by the Key value of the template
+  textfsm_parser:
+    file: files/parser_templates/show_interface.yaml
+    content: "{{ lookup('file', 'output/show_interfaces.txt') }}"
+    name: interfaces
+    output: dict
+
+- name: select the template from the index of ntc-templates
+  textfsm_parser:
+    command: sh ver
+    dir: /usr/share/ntc-templates/templates
+    content: "{{ lookup('file', 'output/show_version.txt') }}"
+    name: version
+  vars:
+    network_engine_textfsm_platform: cisco_ios
 '''
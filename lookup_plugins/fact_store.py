@@ -0,0 +1,100 @@
+# (c) 2018 Red Hat, Inc.
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = """
+lookup: fact_store
+author: Ansible Network
+version_added: "2.6"
+short_description: query the facts written to the local fact store by the parsers
+description:
+  - This plugin queries the SQLite fact store that C(command_parser) and
+    C(textfsm_parser) write to when the C(network_engine_fact_store)
+    variable is set.  Only the selected values are read, so reports across
+    many devices do not need the facts of every host in memory.
+options:
+  _terms:
+    description:
+      - Paths of the values to return, such as C(interface_facts.*.mtu).
+        Path elements are separated by C(.) and list items are written
+        C([0]).  C(*) matches one path element and the values below a
+        matched element are returned as well.
+      - Without paths and C(value), the records are returned with all
+        their facts.
+  store:
+    description:
+      - Path of the fact store.  Defaults to the value of the
+        C(network_engine_fact_store) variable.
+  host:
+    description:
+      - Host or list of hosts to return values for, all hosts by default.
+  parser:
+    description:
+      - Parser or list of parsers the facts were written by, as the file
+        name of the parser.
+  value:
+    description:
+      - Only return the values equal to C(value).
+  latest:
+    description:
+      - Only use the latest record of each host and parser.  Set to false
+        to query every record kept in the store.
+    default: true
+    type: bool
+"""
+
+EXAMPLES = """
+- name: list the MTU of every interface of every device
+  debug: msg="{{ query('fact_store', 'interface_facts.*.mtu') }}"
+
+- name: find the interfaces that are down on two devices
+  debug: msg="{{ query('fact_store', 'interface_facts.*.status', value='down', host=['r1', 'r2']) }}"
+
+- name: read the latest facts of a device
+  debug: msg="{{ query('fact_store', host=inventory_hostname, store='/var/lib/network_engine/facts.db') }}"
+"""
+
+RETURN = """
+_raw:
+   description:
+     - One hash per matching value with the keys host, parser, timestamp,
+       path and value.
+     - Without paths and value, one hash per record with the keys host,
+       parser, timestamp and facts.
+"""
+
+import os
+import sys
+
+from ansible.plugins.lookup import LookupBase
+from ansible.module_utils.parsing.convert_bool import boolean
+from ansible.module_utils._text import to_text
+from ansible.errors import AnsibleError
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.path.pardir, 'lib'))
+from network_engine.store import FactStore, FactStoreError
+
+
+class LookupModule(LookupBase):
+
+    def run(self, terms, variables=None, **kwargs):
+
+        store = kwargs.get('store') or (variables or {}).get('network_engine_fact_store')
+        if not store:
+            raise AnsibleError("value of 'store' must be specified or the network_engine_fact_store variable set")
+
+        path = os.path.expanduser(store)
+        if not os.path.isfile(path):
+            raise AnsibleError('fact store %s does not exist' % path)
+
+        try:
+            with FactStore(path) as fact_store:
+                return fact_store.query(terms, host=kwargs.get('host'), parser=kwargs.get('parser'),
+                                        value=kwargs.get('value'),
+                                        latest=boolean(kwargs.get('latest', True), strict=False))
+        except FactStoreError as exc:
+            raise AnsibleError(to_text(exc))
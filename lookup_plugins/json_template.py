@@ -38,7 +38,7 @@ from ansible.plugins.lookup import LookupBase, display
 from ansible.module_utils._text import to_bytes
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.path.pardir, 'lib'))
-from network_engine.plugins import template_loader
+from network_engine.plugins import template_loader, get_engine
 
 
 class LookupModule(LookupBase):
@@ -48,7 +48,7 @@ class LookupModule(LookupBase):
         ret = list()
 
         self.ds = variables.copy()
-        self.template = template_loader.get('json_template', self._templar)
+        self.template = get_engine(template_loader, 'json_template')(self._templar)
 
         display.debug("File lookup term: %s" % terms[0])
 
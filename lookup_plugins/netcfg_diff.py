@@ -21,12 +21,36 @@ options:
     description:
       - Specifies the wanted text configuration. Theis is usually
         the text configuration that is expected to be present on remote host.
-    required: True
+      - The value can also be a list or a hash of text configurations.  In that
+        case C(have) is only parsed once and a diff is returned for each entry,
+        as a list in the same order or as a hash with the same keys.
+      - This option is mutually exclusive with C(want_file).
+  want_file:
+    description:
+      - Path to a file that contains the wanted text configuration.  The file
+        is read line by line so the configuration text is never held in memory
+        as a whole.  Like C(_terms), the value can also be a list or a hash of paths.
+      - This option is mutually exclusive with C(_terms).
+    version_added: "2.6"
   have:
     description:
       - Specifies the text configuration. The C(have) is usually
         the text configuration that is active on remote host.
-    required: True
+      - This option is mutually exclusive with C(have_file).
+  have_file:
+    description:
+      - Path to a file that contains the C(have) text configuration.  The file
+        is read line by line so the configuration text is never held in memory
+        as a whole.
+      - This option is mutually exclusive with C(have).
+    version_added: "2.6"
+  dest:
+    description:
+      - Path to a file to write the generated diff to.  When this option
+        is set the diff is written to the file one line at a time and the
+        lookup returns the value of C(dest) instead of the diff text.
+        Only a single C(want) is supported when C(dest) is used.
+    version_added: "2.6"
   match:
     description:
       - Instructs the module on the way to perform the matching of
@@ -63,17 +87,33 @@ options:
 EXAMPLES = """
 - name: generate diff between two text configuration
   debug: msg="{{ lookup('netcfg_diff', want, have=have) }}
+
+- name: generate diffs for several snippets against the same running config
+  set_fact:
+    diffs: "{{ lookup('netcfg_diff', {'ntp': ntp_config, 'snmp': snmp_config}, have=have) }}"
+
+- name: diff two large configuration files and write the result to a file
+  debug: msg="{{ lookup('netcfg_diff', want_file='want.cfg', have_file='running.cfg', dest='/tmp/diff.cfg') }}"
 """
 
 RETURN = """
 _raw:
-   description: The text difference between values of want and have with want as base reference
+   description: The text difference between values of want and have with want as base reference.
+     When want is a list or a hash, a list or a hash of differences is returned instead.
+     When dest is set, the path of the file the difference was written to is returned.
 """
 
+import os
+import sys
+
 from ansible.plugins.lookup import LookupBase
-from ansible.module_utils.network.common.config import NetworkConfig, dumps
+from ansible.module_utils.six import iteritems, string_types
+from ansible.module_utils._text import to_bytes
 from ansible.errors import AnsibleError
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.path.pardir, 'lib'))
+from network_engine.config import IndexedConfig, dump, dumps
+
 
 MATCH_CHOICES = ('line', 'strict', 'exact')
 REPLACE_CHOICES = ('line', 'block')
@@ -85,15 +125,30 @@ class LookupModule(LookupBase):
 
         ret = []
 
-        try:
-            want = terms[0]
-        except IndexError:
-            raise AnsibleError("value of 'want' must be specified")
-
-        try:
-            have = kwargs['have']
-        except KeyError:
-            raise AnsibleError("value of 'have' must be specified")
+        want_file = kwargs.get('want_file')
+        have_file = kwargs.get('have_file')
+        dest = kwargs.get('dest')
+
+        if terms and want_file:
+            raise AnsibleError("'want' and 'want_file' are mutually exclusive")
+        elif want_file:
+            want = want_file
+        else:
+            try:
+                want = terms[0]
+            except IndexError:
+                raise AnsibleError("value of 'want' must be specified")
+
+        if 'have' in kwargs and have_file:
+            raise AnsibleError("'have' and 'have_file' are mutually exclusive")
+        elif not have_file:
+            try:
+                have = kwargs['have']
+            except KeyError:
+                raise AnsibleError("value of 'have' must be specified")
+
+        if dest and not isinstance(want, string_types):
+            raise AnsibleError("'dest' can only be used with a single want configuration")
 
         match = kwargs.get('match', 'line')
         if match not in MATCH_CHOICES:
@@ -108,12 +163,44 @@ class LookupModule(LookupBase):
         indent = int(kwargs.get('indent', 1))
         ignore_lines = kwargs.get('ignore_lines')
 
-        running_obj = NetworkConfig(indent=indent, contents=have, ignore_lines=ignore_lines)
-        candidate_obj = NetworkConfig(indent=indent, contents=want, ignore_lines=ignore_lines)
+        if have_file:
+            running_obj = self._load_file(variables, have_file, indent, ignore_lines)
+        else:
+            running_obj = IndexedConfig(indent=indent, contents=have, ignore_lines=ignore_lines)
+
+        def diff(contents):
+            if want_file:
+                candidate_obj = self._load_file(variables, contents, indent, ignore_lines)
+            else:
+                candidate_obj = IndexedConfig(indent=indent, contents=contents, ignore_lines=ignore_lines)
+
+            configobjs = candidate_obj.difference(running_obj, match=match, replace=replace)
+
+            if dest:
+                with open(to_bytes(dest, errors='surrogate_or_strict'), 'wb') as f:
+                    dump(configobjs, f)
+                return dest
 
-        configobjs = candidate_obj.difference(running_obj, match=match, replace=replace)
+            return dumps(configobjs)
 
-        diff = dumps(configobjs, output='commands')
-        ret.append(diff)
+        if isinstance(want, dict):
+            ret.append(dict([(key, diff(value)) for key, value in iteritems(want)]))
+        elif isinstance(want, (list, tuple)):
+            ret.append([diff(value) for value in want])
+        elif isinstance(want, string_types):
+            ret.append(diff(want))
+        else:
+            raise AnsibleError("value of 'want' must be a string, list or hash, got %s" % type(want))
 
         return ret
+
+    def _load_file(self, variables, path, indent, ignore_lines):
+        lookupfile = self.find_file_in_search_path(variables, 'files', path)
+        if not lookupfile:
+            raise AnsibleError("could not locate file in lookup: %s" % path)
+
+        config = IndexedConfig(indent=indent, ignore_lines=ignore_lines)
+        with open(to_bytes(lookupfile, errors='surrogate_or_strict'), 'rb') as f:
+            config.load(f)
+
+        return config
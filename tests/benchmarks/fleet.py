@@ -0,0 +1,328 @@
+#!/usr/bin/env python
+# (c) 2018, Ansible by Red Hat, inc
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Run the cli tasks of the role against a simulated fleet
+
+Every simulated host has a unix socket served by a stub that speaks the
+JSON-RPC protocol of the persistent connection sockets, so the `cli` action
+calls `Connection.get()` exactly as it does against `ansible-connection`.
+The stub answers `get` with a generated `show ip interface brief` table
+or with the recorded outputs of a directory, after a configurable latency.
+
+The playbook imports `tasks/cli.yaml` of the role for every host, with a
+`network_cli` connection plugin that runs locally and leaves the socket to
+the `ansible_socket` variable.  A callback records the time of the `cli`
+task of every host and the peak memory of the controller.  The report
+gives the throughput, the percentiles of the per host latency and the
+controller memory.
+
+Recorded outputs are read from DIR/HOST/COMMAND.txt, then DIR/COMMAND.txt,
+where COMMAND is the command with spaces replaced by `_`.
+
+Usage::
+
+    python tests/benchmarks/fleet.py [--hosts N] [--forks N] [--latency MS]
+        [--jitter MS] [--interfaces N] [--recorded DIR] [--command CMD]
+        [--parser PATH] [--engine ENGINE]
+"""
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import resource
+import selectors
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from ansible.module_utils.connection import recv_data, send_data
+
+from intern_facts import generate
+
+
+ROLE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir, os.path.pardir))
+FIXTURES = os.path.join(ROLE_PATH, 'tests', 'command_parser', 'command_parser')
+
+MAX_HOSTS = 5000
+
+CONNECTION_PLUGIN = '''
+from ansible.plugins.connection.local import Connection as LocalConnection
+
+
+class Connection(LocalConnection):
+    """ network_cli stand in, the cli action finds the stub socket in ansible_socket """
+    transport = 'network_cli'
+'''
+
+CALLBACK_PLUGIN = '''
+import json
+import os
+import resource
+import time
+
+from ansible.plugins.callback import CallbackBase
+
+
+class CallbackModule(CallbackBase):
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = 'aggregate'
+    CALLBACK_NAME = 'fleet_stats'
+    CALLBACK_NEEDS_WHITELIST = True
+
+    def __init__(self):
+        super(CallbackModule, self).__init__()
+        self.started = {}
+        self.latency = {}
+        self.failed = {}
+        self.facts = 0
+
+    def v2_runner_on_start(self, host, task):
+        if task.action == 'cli':
+            self.started[host.get_name()] = time.time()
+
+    def _done(self, result, failed=False):
+        if result._task.action != 'cli':
+            return
+        name = result._host.get_name()
+        self.latency[name] = (self.started.get(name), time.time())
+        if failed:
+            self.failed[name] = result._result.get('msg')
+        else:
+            self.facts += len(result._result.get('ansible_facts') or {})
+
+    def v2_runner_on_ok(self, result):
+        self._done(result)
+
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        self._done(result, failed=True)
+
+    def v2_runner_on_unreachable(self, result):
+        self._done(result, failed=True)
+
+    def v2_playbook_on_stats(self, stats):
+        with open(os.environ['FLEET_STATS'], 'w') as f:
+            json.dump({'latency': self.latency, 'failed': self.failed, 'facts': self.facts,
+                       'maxrss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}, f)
+'''
+
+PLAYBOOK = '''
+- hosts: fleet
+  gather_facts: no
+  tasks:
+    - import_role:
+        name: %(role)s
+        tasks_from: cli
+      vars:
+        network_engine_command: %(command)s
+        network_engine_parser: %(parser)s
+        network_engine_engine: %(engine)s
+'''
+
+
+def host_name(index):
+    return 'r%04d' % index
+
+
+class Outputs(object):
+    """ The output of a command on a host, recorded or generated
+    """
+
+    def __init__(self, recorded, interfaces):
+        self.recorded = recorded
+        self.interfaces = interfaces
+
+    def get(self, index, command):
+        if self.recorded:
+            name = '%s.txt' % command.strip().replace(' ', '_')
+            for path in (os.path.join(self.recorded, host_name(index), name), os.path.join(self.recorded, name)):
+                if os.path.isfile(path):
+                    with open(path) as f:
+                        return f.read()
+            raise KeyError('no recorded output for %s' % command)
+        if command.strip() != 'show ip interface brief':
+            raise KeyError('no generated output for %s' % command)
+        return generate(index, self.interfaces)
+
+
+def handle(conn, index, outputs, latency, jitter):
+    try:
+        request = json.loads(recv_data(conn).decode('utf-8'))
+        args, kwargs = request['params']
+        response = {'jsonrpc': '2.0', 'id': request['id']}
+        if request['method'] != 'get':
+            response['error'] = {'code': -32601, 'message': 'Method not found'}
+        else:
+            try:
+                response['result'] = outputs.get(index, kwargs.get('command') or args[0])
+            except KeyError as exc:
+                response['error'] = {'code': -32603, 'message': exc.args[0]}
+        time.sleep((latency + random.uniform(0, jitter)) / 1000.0)
+        send_data(conn, json.dumps(response).encode('utf-8'))
+    finally:
+        conn.close()
+
+
+def serve(socket_dir, hosts, outputs, latency, jitter, ready, stop):
+    """ Serve the JSON-RPC socket of every host until stop is set
+    """
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hosts + 256:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, hosts + 1024), hard))
+
+    selector = selectors.DefaultSelector()
+    for index in range(hosts):
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(os.path.join(socket_dir, host_name(index)))
+        listener.listen(16)
+        listener.setblocking(False)
+        selector.register(listener, selectors.EVENT_READ, index)
+    ready.set()
+
+    while not stop.is_set():
+        for key, events in selector.select(timeout=0.2):
+            try:
+                conn, addr = key.fileobj.accept()
+            except BlockingIOError:
+                continue
+            conn.setblocking(True)
+            thread = threading.Thread(target=handle, args=(conn, key.data, outputs, latency, jitter))
+            thread.daemon = True
+            thread.start()
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))]
+
+
+def write_files(workdir, args):
+    os.makedirs(os.path.join(workdir, 'connection_plugins'))
+    os.makedirs(os.path.join(workdir, 'callback_plugins'))
+    with open(os.path.join(workdir, 'connection_plugins', 'network_cli.py'), 'w') as f:
+        f.write(CONNECTION_PLUGIN)
+    with open(os.path.join(workdir, 'callback_plugins', 'fleet_stats.py'), 'w') as f:
+        f.write(CALLBACK_PLUGIN)
+
+    with open(os.path.join(workdir, 'ansible.cfg'), 'w') as f:
+        f.write('[defaults]\n'
+                'forks = %d\n'
+                'host_key_checking = False\n'
+                'retry_files_enabled = False\n'
+                'deprecation_warnings = False\n'
+                'callback_whitelist = fleet_stats\n'
+                'connection_plugins = %s\n'
+                'callback_plugins = %s\n' % (args.forks, os.path.join(workdir, 'connection_plugins'),
+                                             os.path.join(workdir, 'callback_plugins')))
+
+    hosts = dict((host_name(i), {'ansible_socket': os.path.join(workdir, 'sockets', host_name(i))})
+                 for i in range(args.hosts))
+    inventory = {'fleet': {'hosts': hosts, 'vars': {'ansible_connection': 'network_cli',
+                                                    'ansible_network_os': 'ios',
+                                                    'ansible_python_interpreter': sys.executable}}}
+    with open(os.path.join(workdir, 'inventory.json'), 'w') as f:
+        json.dump(inventory, f)
+
+    with open(os.path.join(workdir, 'fleet.yml'), 'w') as f:
+        f.write(PLAYBOOK % {'role': json.dumps(ROLE_PATH), 'command': json.dumps(args.command),
+                            'parser': json.dumps(args.parser), 'engine': args.engine})
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix='fleet')
+    socket_dir = os.path.join(workdir, 'sockets')
+    os.makedirs(socket_dir)
+    write_files(workdir, args)
+
+    ready = multiprocessing.Event()
+    stop = multiprocessing.Event()
+    outputs = Outputs(args.recorded, args.interfaces)
+    stub = multiprocessing.Process(target=serve, args=(socket_dir, args.hosts, outputs, args.latency, args.jitter, ready, stop))
+    stub.start()
+
+    try:
+        if not ready.wait(60):
+            raise SystemExit('stub connection did not start')
+
+        env = dict(os.environ, ANSIBLE_CONFIG=os.path.join(workdir, 'ansible.cfg'),
+                   FLEET_STATS=os.path.join(workdir, 'stats.json'))
+        playbook = os.path.join(os.path.dirname(sys.executable), 'ansible-playbook')
+        if not os.path.exists(playbook):
+            playbook = 'ansible-playbook'
+
+        start = time.time()
+        with open(os.path.join(workdir, 'playbook.log'), 'w') as log:
+            rc = subprocess.call([playbook, '-i', os.path.join(workdir, 'inventory.json'), os.path.join(workdir, 'fleet.yml')],
+                                 cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+        elapsed = time.time() - start
+
+        if not os.path.exists(env['FLEET_STATS']):
+            with open(os.path.join(workdir, 'playbook.log')) as log:
+                sys.stderr.write(log.read()[-4000:])
+            raise SystemExit('ansible-playbook exited with %d' % rc)
+
+        with open(env['FLEET_STATS']) as f:
+            stats = json.load(f)
+    finally:
+        stop.set()
+        stub.join(5)
+        if stub.is_alive():
+            stub.terminate()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    times = [t for t in stats['latency'].values() if t[0] is not None]
+    latencies = [(end - begin) * 1000 for begin, end in times]
+    window = (max(t[1] for t in times) - min(t[0] for t in times)) if times else 0
+
+    print('hosts %d, forks %d, stub latency %d+%d ms' % (args.hosts, args.forks, args.latency, args.jitter))
+    print('%-28s %10.2f' % ('playbook wall time s', elapsed))
+    print('%-28s %10.2f' % ('cli task time s', window))
+    print('%-28s %10.1f' % ('throughput hosts/s', len(times) / window if window else 0))
+    for pct in (50, 90, 99):
+        print('%-28s %10.1f' % ('latency p%d ms' % pct, percentile(latencies, pct)))
+    print('%-28s %10.1f' % ('latency max ms', max(latencies) if latencies else 0))
+    print('%-28s %10.1f' % ('controller peak rss MB', stats['maxrss'] / 1024.0))
+    print('%-28s %10d' % ('facts returned', stats['facts']))
+    print('%-28s %10d' % ('failed hosts', len(stats['failed'])))
+    for name, msg in sorted(stats['failed'].items())[:5]:
+        print('  %s: %s' % (name, msg))
+
+    return 1 if stats['failed'] or rc else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='run the cli tasks of the role against a simulated fleet')
+    parser.add_argument('--hosts', type=int, default=100, help='number of simulated hosts, 1 to %d' % MAX_HOSTS)
+    parser.add_argument('--forks', type=int, default=50, help='number of ansible forks')
+    parser.add_argument('--latency', type=int, default=50, help='stub response time in ms')
+    parser.add_argument('--jitter', type=int, default=0, help='random extra response time in ms')
+    parser.add_argument('--interfaces', type=int, default=48, help='interfaces in the generated output of a host')
+    parser.add_argument('--recorded', help='directory of recorded outputs to serve instead of generated ones')
+    parser.add_argument('--command', default='show ip interface brief', help='command run on every host')
+    parser.add_argument('--parser', default=os.path.join(FIXTURES, 'parser_templates', 'ios', 'show_ip_interface_brief.yaml'),
+                        help='parser of the command output')
+    parser.add_argument('--engine', default='command_parser', choices=('command_parser', 'textfsm_parser'),
+                        help='engine of the parser')
+    args = parser.parse_args()
+
+    if not 1 <= args.hosts <= MAX_HOSTS:
+        parser.error('--hosts must be between 1 and %d' % MAX_HOSTS)
+
+    sys.exit(run(args))
+
+
+if __name__ == '__main__':
+    main()
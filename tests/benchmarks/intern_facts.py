@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# (c) 2018, Ansible by Red Hat, inc
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Measure the memory the controller keeps for parsed facts
+
+The interface facts of every host are parsed from a generated
+`show ip interface brief` table by the table_match engine, optionally
+interned like `network_engine_intern_facts` does in the worker, then
+pickled and unpickled like a task result sent to the controller.  The
+memory held by the unpickled facts of all hosts is reported.
+
+Usage::
+
+    python tests/benchmarks/intern_facts.py [--hosts N] [--interfaces N]
+"""
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import argparse
+import os
+import pickle
+import sys
+import tracemalloc
+
+ROLE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir, os.path.pardir))
+sys.path.insert(0, os.path.join(ROLE_PATH, 'lib'))
+
+from network_engine.facts import InternTable
+from network_engine.plugins.parser import table_match
+
+
+HEADER = 'Interface              IP-Address      OK? Method Status                Protocol\n'
+COLUMNS = ['Interface', 'IP-Address', 'OK?', 'Method', 'Status', 'Protocol']
+
+
+def generate(host, interfaces):
+    lines = [HEADER]
+    for i in range(interfaces):
+        down = (host + i) % 5 == 0
+        lines.append('%-23s%-16s%-4s%-7s%-22s%s\n' % (
+            'GigabitEthernet%d/%d' % (i // 48, i % 48),
+            'unassigned' if down else '10.%d.%d.%d' % (host // 256 % 256, host % 256, i % 256),
+            'YES', 'NVRAM' if i % 3 else 'manual',
+            'administratively down' if down else 'up',
+            'down' if down else 'up'
+        ))
+    return ''.join(lines)
+
+
+def run(hosts, interfaces, intern):
+    outputs = [generate(h, interfaces) for h in range(hosts)]
+
+    tracemalloc.start()
+    controller = list()
+    for output in outputs:
+        facts = {'interfaces': table_match.ParserEngine(output).match(columns=COLUMNS)}
+        if intern:
+            # every task runs in its own worker process with a new table
+            facts = InternTable().intern_facts(facts)
+        controller.append(pickle.loads(pickle.dumps(facts, protocol=2)))
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return current
+
+
+def main():
+    parser = argparse.ArgumentParser(description='measure the memory held by parsed facts')
+    parser.add_argument('--hosts', type=int, default=1000, help='number of hosts')
+    parser.add_argument('--interfaces', type=int, default=96, help='number of interfaces per host')
+    args = parser.parse_args()
+
+    print('%-10s %12s' % ('facts', 'memory MB'))
+    for intern in (False, True):
+        current = run(args.hosts, args.interfaces, intern)
+        print('%-10s %12.1f' % ('interned' if intern else 'plain', current / 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# (c) 2018, Ansible by Red Hat, inc
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Compare the pattern_match regex backends on the test fixtures
+
+Every literal regex in the command_parser parser templates of the tests
+directory is run with `findall` against the command output fixtures of the
+same role and platform, once per backend.  A pattern with nested
+quantifiers is then run against a string it cannot match to show the
+cost of backtracking.  Backends that are not installed are skipped.
+
+Usage::
+
+    python tests/benchmarks/regex_backends.py [--repeat N] [--backtrack N]
+"""
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import argparse
+import glob
+import os
+import re
+import sys
+import time
+
+ROLE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir, os.path.pardir))
+sys.path.insert(0, os.path.join(ROLE_PATH, 'lib'))
+
+from ansible.parsing.dataloader import DataLoader
+
+from network_engine import compiler
+from network_engine.regex_backend import BACKENDS, get_backend
+
+
+BACKTRACK_REGEX = r'^(\w+\s?)+$'
+
+
+def fixtures():
+    """ Return a list of (regexes, outputs) for each role and platform
+    """
+    loader = DataLoader()
+    cases = list()
+
+    for parser_dir in sorted(glob.glob(os.path.join(ROLE_PATH, 'tests', '*', '*', 'parser_templates', '*'))):
+        output_dir = os.path.join(os.path.dirname(os.path.dirname(parser_dir)), 'output', os.path.basename(parser_dir))
+        outputs = list()
+        for filename in sorted(glob.glob(os.path.join(output_dir, '*.txt'))):
+            with open(filename) as f:
+                outputs.append(f.read())
+
+        regexes = list()
+        for path in compiler.find_sources([parser_dir]):
+            try:
+                artifact = compiler.compile_file(path, loader)
+            except Exception:
+                continue
+            regexes.extend(r for r in artifact['regexes'] if r not in regexes)
+
+        if regexes and outputs:
+            cases.append((regexes, outputs))
+
+    return cases
+
+
+def run_fixtures(backend, cases, repeat):
+    fallback = 0
+    patterns = list()
+    for regexes, outputs in cases:
+        for regex in regexes:
+            try:
+                patterns.append((backend.compile(regex, re.M), outputs))
+            except Exception:
+                fallback += 1
+                patterns.append((re.compile(regex, re.M), outputs))
+
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        for pattern, outputs in patterns:
+            for output in outputs:
+                pattern.findall(output)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return len(patterns), fallback, best
+
+
+def run_backtrack(backend, length):
+    pattern = backend.compile(BACKTRACK_REGEX, re.M)
+    text = 'word ' * length + '!'
+    start = time.time()
+    pattern.findall(text)
+    return time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='compare the pattern_match regex backends')
+    parser.add_argument('--repeat', type=int, default=20, help='number of runs over the fixtures, the best is reported')
+    parser.add_argument('--backtrack', type=int, default=6, help='number of words in the backtracking test string')
+    args = parser.parse_args()
+
+    cases = fixtures()
+
+    print('%-8s %10s %10s %14s %16s' % ('backend', 'patterns', 'fallback', 'fixtures ms', 'backtrack ms'))
+
+    for name in sorted(BACKENDS):
+        backend = get_backend(name)
+        if backend is None:
+            print('%-8s not installed' % name)
+            continue
+
+        count, fallback, elapsed = run_fixtures(backend, cases, args.repeat)
+        backtrack = run_backtrack(backend, args.backtrack)
+        print('%-8s %10d %10d %14.2f %16.2f' % (name, count, fallback, elapsed * 1000, backtrack * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# (c) 2018, Ansible by Red Hat, inc
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Measure the fixed per-task cost of the network-engine plugins
+
+Every task runs in a fresh worker process, so the time to import a plugin
+and to run it for the first time is paid on every task.  For each plugin
+this script starts a new interpreter, imports the Ansible modules a worker
+has already loaded, and then reports the time to import the plugin, the
+time of the first call and the time of a second call against the fixtures
+in the tests directory.
+
+Usage::
+
+    python tests/benchmarks/startup.py [--repeat N]
+"""
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+
+ROLE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir, os.path.pardir))
+FIXTURES = os.path.join(ROLE_PATH, 'tests', 'command_parser', 'command_parser')
+NETCFG_FIXTURES = os.path.join(ROLE_PATH, 'tests', 'netcfg_diff', 'netcfg_diff', 'files', 'ios')
+TEXTFSM_FIXTURES = os.path.join(ROLE_PATH, 'tests', 'textfsm_parser', 'textfsm_parser')
+
+WORKER = r'''
+import imp
+import json
+import os
+import sys
+import time
+
+# modules a task worker has already imported before the plugin is loaded
+import ansible.plugins.action
+import ansible.plugins.lookup
+from ansible.parsing.dataloader import DataLoader
+from ansible.playbook.play_context import PlayContext
+from ansible.playbook.task import Task
+from ansible.plugins import loader as plugin_loader
+from ansible.template import Templar
+
+kind, path, args, task_vars = json.loads(sys.argv[1])
+
+start = time.time()
+module = imp.load_source('bench_plugin', path)
+timings = {'import': time.time() - start}
+
+loader = DataLoader()
+templar = Templar(loader=loader)
+
+if kind == 'action':
+    play_context = PlayContext()
+    connection = plugin_loader.connection_loader.get('local', play_context, '/dev/null')
+
+    def call():
+        task = Task()
+        task.args = dict(args)
+        action = module.ActionModule(task, connection, play_context, loader, templar, plugin_loader)
+        result = action.run(task_vars=dict(task_vars))
+        if result.get('failed'):
+            raise Exception(result['msg'])
+else:
+    terms = args.pop('_terms', [])
+
+    def call():
+        lookup = module.LookupModule(loader=loader, templar=templar)
+        lookup.run(list(terms), dict(task_vars), **args)
+
+for label in ('first call', 'second call'):
+    start = time.time()
+    call()
+    timings[label] = time.time() - start
+
+print(json.dumps(timings))
+'''
+
+
+def read(path):
+    with open(path) as f:
+        return f.read()
+
+
+def cases():
+    task_vars = {'ansible_network_os': 'ios', 'export_type': 'list'}
+
+    yield ('command_parser', 'action', 'action_plugins/command_parser.py', {
+        'file': os.path.join(FIXTURES, 'parser_templates', 'ios', 'show_interfaces.yaml'),
+        'content': read(os.path.join(FIXTURES, 'output', 'ios', 'show_interfaces.txt'))
+    }, task_vars)
+
+    try:
+        import textfsm  # noqa: F401
+    except ImportError:
+        pass
+    else:
+        yield ('textfsm_parser', 'action', 'action_plugins/textfsm_parser.py', {
+            'file': os.path.join(TEXTFSM_FIXTURES, 'parser_templates', 'ios', 'show_interfaces'),
+            'content': read(os.path.join(TEXTFSM_FIXTURES, 'output', 'ios', 'show_interfaces.txt')),
+            'name': 'interfaces'
+        }, task_vars)
+
+    yield ('netcfg_diff', 'lookup', 'lookup_plugins/netcfg_diff.py', {
+        '_terms': [read(os.path.join(NETCFG_FIXTURES, 'want.txt'))],
+        'have': read(os.path.join(NETCFG_FIXTURES, 'have.txt'))
+    }, task_vars)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='measure plugin import and first call time')
+    parser.add_argument('--repeat', type=int, default=5, help='number of fresh processes per plugin')
+    args = parser.parse_args()
+
+    # deprecation warnings are formatted on every call and hide the plugin time
+    env = dict(os.environ, ANSIBLE_DEPRECATION_WARNINGS='False')
+
+    print('%-16s %12s %12s %12s' % ('plugin', 'import ms', 'first ms', 'second ms'))
+
+    for name, kind, path, plugin_args, task_vars in cases():
+        runs = list()
+        payload = json.dumps([kind, os.path.join(ROLE_PATH, path), plugin_args, task_vars])
+
+        for _ in range(args.repeat):
+            out = subprocess.check_output([sys.executable, '-W', 'ignore::DeprecationWarning', '-c', WORKER, payload], cwd=ROLE_PATH, env=env)
+            runs.append(json.loads(out.decode('utf-8').strip().splitlines()[-1]))
+
+        best = dict((key, min(r[key] for r in runs) * 1000) for key in runs[0])
+        print('%-16s %12.1f %12.1f %12.1f' % (name, best['import'], best['first call'], best['second call']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# (c) 2018, Ansible by Red Hat, inc
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Compare table_match with pattern_match on a fixed width table
+
+A `show ip interface brief` table with the given number of rows is parsed
+by the table_match engine and by the pattern_match engine with `match_all`
+and a regex that captures the same columns.  The best time of the runs is
+reported for each.
+
+Usage::
+
+    python tests/benchmarks/table_match.py [--rows N] [--repeat N]
+"""
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import argparse
+import os
+import sys
+import time
+
+ROLE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir, os.path.pardir))
+sys.path.insert(0, os.path.join(ROLE_PATH, 'lib'))
+
+from network_engine.plugins.parser import pattern_match, table_match
+
+
+HEADER = 'Interface              IP-Address      OK? Method Status                Protocol\n'
+COLUMNS = ['Interface', 'IP-Address', 'OK?', 'Method', 'Status', 'Protocol']
+REGEX = (r'^(?P<interface>\S+)\s+(?P<ip_address>\S+)\s+(?P<ok>\S+)\s+(?P<method>\S+)'
+         r'\s+(?P<status>.+?)\s+(?P<protocol>\S+)\s*$')
+
+
+def generate(rows):
+    lines = [HEADER]
+    for i in range(rows):
+        down = i % 7 == 0
+        lines.append('%-23s%-16s%-4s%-7s%-22s%s\n' % (
+            'GigabitEthernet%d/%d' % (i // 48, i % 48),
+            '10.%d.%d.1' % (i // 256 % 256, i % 256),
+            'YES', 'NVRAM',
+            'administratively down' if down else 'up',
+            'down' if down else 'up'
+        ))
+    return ''.join(lines)
+
+
+def best(func, repeat):
+    elapsed = None
+    for _ in range(repeat):
+        start = time.time()
+        result = func()
+        run = time.time() - start
+        elapsed = run if elapsed is None else min(elapsed, run)
+    return elapsed, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='compare table_match with pattern_match')
+    parser.add_argument('--rows', type=int, default=100000, help='number of rows in the table')
+    parser.add_argument('--repeat', type=int, default=5, help='number of runs, the best is reported')
+    args = parser.parse_args()
+
+    text = generate(args.rows)
+
+    table_time, rows = best(lambda: table_match.ParserEngine(text).match(columns=COLUMNS), args.repeat)
+    regex_time, matches = best(lambda: pattern_match.ParserEngine(text).match(REGEX, match_all=True), args.repeat)
+
+    # the regex also matches the header line
+    assert len(rows) == len(matches) - 1 == args.rows
+
+    print('%-14s %10s %12s' % ('engine', 'rows', 'seconds'))
+    print('%-14s %10d %12.3f' % ('table_match', len(rows), table_time))
+    print('%-14s %10d %12.3f' % ('pattern_match', len(matches), regex_time))
+
+
+if __name__ == '__main__':
+    main()